@@ -1,20 +1,25 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
 from app.models.extraction import ExtractionResult
-from app.services.extraction_service import get_cached_extraction
-from app.utils.file_utils import load_json
+from app.db import document_store
+from app.services.extraction_service import get_cached_extraction_with_json
+from app.utils.async_utils import run_blocking
 
 router = APIRouter(prefix="/comparison", tags=["comparison"])
 
-DOCS_STORE_PATH = "data/documents.json"
+
+def _completed_extractions_json() -> bytes:
+    """JSON array of completed extractions, assembled from each result's cached serialization."""
+    parts = []
+    for doc_id in document_store.list_doc_ids():
+        cached = get_cached_extraction_with_json(doc_id)
+        if cached and cached[0].status == "completed":
+            parts.append(cached[1])
+    return b"[" + b",".join(parts) + b"]"
 
 
 @router.get("/documents", response_model=list[ExtractionResult])
 async def get_comparison_data():
     """Get all documents with extraction data for comparison."""
-    docs = load_json(DOCS_STORE_PATH) or {}
-    results = []
-    for doc_id in docs:
-        cached = get_cached_extraction(doc_id)
-        if cached and cached.status == "completed":
-            results.append(cached)
-    return results
+    content = await run_blocking(_completed_extractions_json)
+    return Response(content=content, media_type="application/json")
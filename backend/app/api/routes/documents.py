@@ -1,116 +1,132 @@
 import os
 import shutil
 import json
-import asyncio
+import hashlib
 import logging
-import threading
 from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Header
 from fastapi.responses import StreamingResponse
+import aiofiles
 
 logger = logging.getLogger(__name__)
 from app.config import UPLOAD_DIR, DEMO_DOCS_DIR, MAX_FILE_SIZE_MB
 from app.models.document import DocumentMetadata, DocumentListResponse
-from app.services.pdf_processor import extract_text_with_pages, get_page_count
-from app.services.vector_service import add_document_to_store, delete_document_from_store
-from app.services.extraction_service import extract_document
-from app.utils.file_utils import generate_doc_id, save_json, load_json, ensure_dirs
+from app.db import document_store, job_queue
+from app.services.pdf_processor import set_content_hash, delete_stored_pages
+from app.services.vector_service import delete_document_from_store, copy_document_in_store
+from app.services.extraction_service import copy_extraction, delete_extraction
+from app.services.ingest_pipeline import INGEST, IngestPipeline
+from app.services.progress_bus import progress_bus, emit_progress
+from app.services.faq_service import copy_faqs, delete_faqs
+from app.utils.file_utils import generate_doc_id, ensure_dirs, hash_file
+from app.utils.async_utils import run_blocking
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-DOCS_STORE_PATH = "data/documents.json"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-# Thread lock for safe concurrent JSON file access
-_docs_lock = threading.Lock()
 
-# Progress tracking for SSE
-_progress_store: dict[str, list[dict]] = {}
+async def _stream_upload(file: UploadFile, filepath: str) -> tuple[int, str]:
+    """Stream an upload to disk in fixed-size chunks, enforcing the size limit and hashing as it goes.
 
+    Returns (size in bytes, sha256 hex digest). A partially written file is removed on failure.
+    """
+    max_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(400, f"File {file.filename} exceeds {MAX_FILE_SIZE_MB}MB limit")
 
-def _load_docs() -> dict[str, dict]:
-    with _docs_lock:
-        data = load_json(DOCS_STORE_PATH)
-        return data or {}
-
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(filepath, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(400, f"File {file.filename} exceeds {MAX_FILE_SIZE_MB}MB limit")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+    return size, digest.hexdigest()
 
-def _save_docs(docs: dict[str, dict]):
-    with _docs_lock:
-        save_json(DOCS_STORE_PATH, docs)
 
+ingest_pipeline = IngestPipeline(
+    get_doc=document_store.get_doc, update_doc=document_store.update_doc, emit_progress=emit_progress,
+)
 
-def _update_doc(doc_id: str, updates: dict):
-    """Thread-safe update of a single document's fields."""
-    with _docs_lock:
-        data = load_json(DOCS_STORE_PATH) or {}
-        if doc_id in data:
-            data[doc_id].update(updates)
-            save_json(DOCS_STORE_PATH, data)
 
+def _find_duplicate(content_hash: str) -> dict | None:
+    """Find an existing document with the same file content, preferring a processed one."""
+    if not content_hash:
+        return None
+    matches = [
+        d for d in document_store.find_by_content_hash(content_hash)
+        if os.path.exists(os.path.join(UPLOAD_DIR, d["filename"]))
+    ]
+    processed = [d for d in matches if d.get("status") == "processed"]
+    return (processed or matches or [None])[0]
 
-def _emit_progress(doc_id: str, step: str, status: str, detail: str = "", progress: int = 0):
-    """Store a progress event for a document."""
-    if doc_id not in _progress_store:
-        _progress_store[doc_id] = []
-    _progress_store[doc_id].append({
-        "doc_id": doc_id,
-        "step": step,
-        "status": status,
-        "detail": detail,
-        "progress": progress,
-        "timestamp": datetime.now().isoformat(),
-    })
 
+def _clone_document(src: dict, doc_meta: DocumentMetadata) -> bool:
+    """Give a new record for an already-processed file its own copy of the vectors and artifacts.
 
-def _process_document(doc_id: str, filepath: str, filename: str):
-    """Background task: extract text, chunk, embed, store in ChromaDB, and run extraction."""
+    Returns False if the source turned out to have no vectors or extraction to reuse, in
+    which case the caller should process the document normally. FAQs are copied when the
+    source has completed ones; otherwise they are generated on demand, as for the source.
+    """
     try:
-        _update_doc(doc_id, {"status": "processing"})
-        logger.info(f"[{doc_id}] Starting processing: {filename}")
-
-        # Step 1: Extract text
-        _emit_progress(doc_id, "text_extraction", "started", f"Extracting text from {filename}...", 10)
-        pages = extract_text_with_pages(filepath)
-        page_count = len(pages)
-        logger.info(f"[{doc_id}] Text extracted: {page_count} pages")
-        _emit_progress(doc_id, "text_extraction", "completed", f"Extracted {page_count} pages", 25)
-
-        # Step 2: Chunking & embedding
-        _emit_progress(doc_id, "embedding", "started", "Generating embeddings...", 35)
-        logger.info(f"[{doc_id}] Starting embedding generation...")
-        add_document_to_store(doc_id, filename, pages)
-        logger.info(f"[{doc_id}] Embeddings complete")
-        _emit_progress(doc_id, "embedding", "completed", "Indexed in vector database", 60)
-
-        # Step 3: AI extraction
-        _emit_progress(doc_id, "ai_extraction", "started", "AI analysis in progress...", 65)
-        logger.info(f"[{doc_id}] Starting AI extraction...")
-        extract_document(doc_id, filepath)
-        logger.info(f"[{doc_id}] AI extraction complete")
-        _emit_progress(doc_id, "ai_extraction", "completed", "AI extraction complete", 95)
-
-        # Step 4: Done
-        _update_doc(doc_id, {"status": "processed", "page_count": page_count})
-        _emit_progress(doc_id, "done", "completed", "Done!", 100)
-        logger.info(f"[{doc_id}] Processing complete!")
+        if not copy_document_in_store(src["id"], doc_meta.id, doc_meta.original_filename):
+            return False
+        if not copy_extraction(src["id"], doc_meta.id):
+            logger.info(f"[{doc_meta.id}] {src['id']} has no extraction to reuse; processing normally")
+            delete_document_from_store(doc_meta.id)
+            return False
+        if not copy_faqs(src["id"], doc_meta.id, doc_meta.original_filename):
+            logger.info(f"[{doc_meta.id}] {src['id']} has no completed FAQs to reuse; they will be generated on demand")
     except Exception as e:
-        logger.exception(f"Error processing document {doc_id} ({filename}): {e}")
-        _update_doc(doc_id, {"status": "error", "error_message": str(e)})
-        _emit_progress(doc_id, "error", "error", str(e), 0)
+        logger.warning(f"[{doc_meta.id}] Could not reuse artifacts from {src['id']}: {e}")
+        delete_document_from_store(doc_meta.id)
+        delete_extraction(doc_meta.id)
+        delete_faqs(doc_meta.id)
+        return False
+    doc_meta.status = "processed"
+    doc_meta.page_count = src.get("page_count", 0)
+    return True
+
+
+def _register_document(doc_meta: DocumentMetadata, duplicate: dict | None, label: str) -> bool:
+    """Store a new document record, reusing a duplicate's processing results when possible.
 
+    Returns True if the document still needs processing.
+    """
+    reused = duplicate is not None and duplicate.get("status") == "processed" and _clone_document(duplicate, doc_meta)
 
-def _process_documents_sequential(doc_tasks: list[tuple[str, str, str]]):
-    """Process documents one at a time to avoid OpenAI rate limits and file race conditions."""
-    for doc_id, filepath, filename in doc_tasks:
-        _process_document(doc_id, filepath, filename)
+    document_store.insert_doc(doc_meta.model_dump())
+
+    emit_progress(doc_meta.id, "upload", "completed", f"{label}: {doc_meta.original_filename}", 5)
+    if reused:
+        logger.info(f"[{doc_meta.id}] Reused processing results from identical document {duplicate['id']}")
+        emit_progress(doc_meta.id, "done", "completed", "Identical document already processed", 100)
+    return not reused
+
+
+def _release_file(doc: dict):
+    """Delete a document's PDF and stored page text unless another document still references it."""
+    if document_store.filename_in_use(doc["filename"]):
+        return
+    filepath = os.path.join(UPLOAD_DIR, doc.get("filename", ""))
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    if doc.get("content_hash"):
+        delete_stored_pages(doc["content_hash"])
 
 
 @router.post("/upload", response_model=list[DocumentMetadata])
-async def upload_documents(
-    background_tasks: BackgroundTasks,
-    files: list[UploadFile] = File(...),
-):
+async def upload_documents(files: list[UploadFile] = File(...)):
     """Upload one or more PDF documents."""
-    ensure_dirs()
+    await run_blocking(ensure_dirs)
     results = []
     doc_tasks = []
 
@@ -118,37 +134,37 @@ async def upload_documents(
         if not file.filename.lower().endswith(".pdf"):
             raise HTTPException(400, f"Only PDF files are supported. Got: {file.filename}")
 
-        content = await file.read()
-        size_mb = len(content) / (1024 * 1024)
-        if size_mb > MAX_FILE_SIZE_MB:
-            raise HTTPException(400, f"File {file.filename} exceeds {MAX_FILE_SIZE_MB}MB limit")
-
         doc_id = generate_doc_id()
         safe_filename = file.filename.replace(" ", "_")
         filepath = os.path.join(UPLOAD_DIR, f"{doc_id}_{safe_filename}")
 
-        with open(filepath, "wb") as f:
-            f.write(content)
+        file_size, content_hash = await _stream_upload(file, filepath)
+        stored_filename = f"{doc_id}_{safe_filename}"
+
+        # Identical content already on disk: share that file instead of keeping a second copy
+        duplicate = await run_blocking(_find_duplicate, content_hash)
+        if duplicate:
+            await run_blocking(os.remove, filepath)
+            stored_filename = duplicate["filename"]
+            filepath = os.path.join(UPLOAD_DIR, stored_filename)
+        await run_blocking(set_content_hash, filepath, content_hash)
 
         doc_meta = DocumentMetadata(
             id=doc_id,
-            filename=f"{doc_id}_{safe_filename}",
+            filename=stored_filename,
             original_filename=file.filename,
-            file_size=len(content),
+            file_size=file_size,
+            content_hash=content_hash,
             status="uploaded",
             upload_date=datetime.now().isoformat(),
         )
 
-        docs = _load_docs()
-        docs[doc_id] = doc_meta.model_dump()
-        _save_docs(docs)
-
-        _emit_progress(doc_id, "upload", "completed", f"Uploaded: {file.filename}", 5)
-        doc_tasks.append((doc_id, filepath, file.filename))
+        if await run_blocking(_register_document, doc_meta, duplicate, "Uploaded"):
+            doc_tasks.append((doc_id, filepath, file.filename))
         results.append(doc_meta)
 
     if doc_tasks:
-        background_tasks.add_task(_process_documents_sequential, doc_tasks)
+        await ingest_pipeline.submit(doc_tasks)
 
     return results
 
@@ -156,37 +172,15 @@ async def upload_documents(
 @router.get("", response_model=DocumentListResponse)
 async def list_documents():
     """List all uploaded documents."""
-    docs = _load_docs()
-    doc_list = [DocumentMetadata(**d) for d in docs.values()]
-    doc_list.sort(key=lambda d: d.upload_date, reverse=True)
+    docs = await run_blocking(document_store.list_docs)
+    doc_list = [DocumentMetadata(**d) for d in docs]
     return DocumentListResponse(documents=doc_list, total=len(doc_list))
 
 
-@router.get("/progress/stream")
-async def stream_progress():
-    """SSE endpoint to stream processing progress for all documents."""
+def _progress_response(doc_id: str | None, last_event_id: int) -> StreamingResponse:
     async def event_stream():
-        sent_counts: dict[str, int] = {}
-        idle_count = 0
-        while True:
-            has_new = False
-            for doc_id, events in list(_progress_store.items()):
-                start = sent_counts.get(doc_id, 0)
-                if start < len(events):
-                    for event in events[start:]:
-                        yield f"data: {json.dumps(event)}\n\n"
-                        has_new = True
-                    sent_counts[doc_id] = len(events)
-
-            if has_new:
-                idle_count = 0
-            else:
-                idle_count += 1
-
-            if idle_count > 300:
-                break
-
-            await asyncio.sleep(0.5)
+        async for event_id, event in progress_bus.subscribe(doc_id, last_event_id):
+            yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
 
     return StreamingResponse(
         event_stream(),
@@ -199,146 +193,190 @@ async def stream_progress():
     )
 
 
+@router.get("/progress/stream")
+async def stream_progress(last_event_id: int = Header(0)):
+    """SSE endpoint to stream processing progress for all documents.
+
+    Replays retained events after Last-Event-ID (all retained events if absent), then streams live ones.
+    """
+    return _progress_response(None, last_event_id)
+
+
+@router.get("/{doc_id}/progress/stream")
+async def stream_document_progress(doc_id: str, last_event_id: int = Header(0)):
+    """SSE endpoint to stream processing progress for a single document."""
+    if await run_blocking(document_store.get_doc, doc_id) is None:
+        raise HTTPException(404, "Document not found")
+    return _progress_response(doc_id, last_event_id)
+
+
 @router.get("/{doc_id}", response_model=DocumentMetadata)
 async def get_document(doc_id: str):
     """Get a specific document's metadata."""
-    docs = _load_docs()
-    if doc_id not in docs:
+    doc = await run_blocking(document_store.get_doc, doc_id)
+    if doc is None:
         raise HTTPException(404, "Document not found")
-    return DocumentMetadata(**docs[doc_id])
+    return DocumentMetadata(**doc)
 
 
-@router.delete("/{doc_id}")
-async def delete_document(doc_id: str):
-    """Delete a document and its data."""
-    docs = _load_docs()
-    if doc_id not in docs:
-        raise HTTPException(404, "Document not found")
-
+def _delete_document_data(doc_id: str):
+    job_queue.cancel_for_doc(doc_id)
     delete_document_from_store(doc_id)
 
-    filepath = os.path.join(UPLOAD_DIR, docs[doc_id]["filename"])
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    doc = document_store.delete_doc(doc_id)
+    if doc:
+        _release_file(doc)
 
-    del docs[doc_id]
-    _save_docs(docs)
+    delete_extraction(doc_id)
+    delete_faqs(doc_id)
 
-    for subdir in ["extractions", "faqs"]:
-        path = os.path.join("data", subdir, f"{doc_id}.json")
-        if os.path.exists(path):
-            os.remove(path)
 
-    _progress_store.pop(doc_id, None)
+@router.delete("/{doc_id}")
+async def delete_document(doc_id: str):
+    """Delete a document and its data."""
+    if await run_blocking(document_store.get_doc, doc_id) is None:
+        raise HTTPException(404, "Document not found")
+
+    await run_blocking(_delete_document_data, doc_id)
+    await run_blocking(job_queue.clear_progress, doc_id)
 
     return {"message": "Document deleted"}
 
 
-@router.delete("")
-async def delete_all_documents():
-    """Delete all documents and reset."""
-    docs = _load_docs()
-    for doc_id, doc_data in list(docs.items()):
+def _delete_all_document_data():
+    for doc in document_store.delete_all_docs():
+        doc_id = doc["id"]
+        job_queue.cancel_for_doc(doc_id)
         try:
             delete_document_from_store(doc_id)
         except Exception:
             pass
-        filepath = os.path.join(UPLOAD_DIR, doc_data.get("filename", ""))
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        for subdir in ["extractions", "faqs"]:
-            path = os.path.join("data", subdir, f"{doc_id}.json")
-            if os.path.exists(path):
-                os.remove(path)
+        _release_file(doc)
+        delete_extraction(doc_id)
+        delete_faqs(doc_id)
 
-    _save_docs({})
-    _progress_store.clear()
+
+@router.delete("")
+async def delete_all_documents():
+    """Delete all documents and reset."""
+    await run_blocking(_delete_all_document_data)
+    await run_blocking(job_queue.clear_progress)
     return {"message": "All documents deleted"}
 
 
+def _reset_for_reprocess(doc_id: str):
+    """Drop a document's vectors and mark it for processing again."""
+    try:
+        delete_document_from_store(doc_id)
+    except Exception:
+        pass
+    document_store.update_doc(doc_id, {"status": "uploaded"})
+
+
 @router.post("/reprocess/{doc_id}")
-async def reprocess_document(doc_id: str, background_tasks: BackgroundTasks):
-    """Reprocess a document (re-extract text, re-embed, re-extract with AI)."""
-    docs = _load_docs()
-    if doc_id not in docs:
+async def reprocess_document(doc_id: str, refresh: bool = False):
+    """Reprocess a document (re-extract text, re-embed, re-extract with AI).
+
+    refresh=true bypasses the LLM response cache so the AI steps are rerun.
+    """
+    doc = await run_blocking(document_store.get_doc, doc_id)
+    if doc is None:
         raise HTTPException(404, "Document not found")
 
-    doc = docs[doc_id]
     filepath = os.path.join(UPLOAD_DIR, doc["filename"])
-    if not os.path.exists(filepath):
+    if not await run_blocking(os.path.exists, filepath):
         raise HTTPException(404, "Document file not found on disk")
 
-    try:
-        delete_document_from_store(doc_id)
-    except Exception:
-        pass
+    # A running job may already be past its embed checkpoint and would not restore the vectors reset here
+    if await run_blocking(job_queue.has_active, INGEST, doc_id):
+        raise HTTPException(409, "Document is still being processed")
 
-    _update_doc(doc_id, {"status": "uploaded"})
-    background_tasks.add_task(_process_documents_sequential, [(doc_id, filepath, doc["original_filename"])])
+    await run_blocking(_reset_for_reprocess, doc_id)
+    await ingest_pipeline.submit([(doc_id, filepath, doc["original_filename"])], refresh=refresh)
     return {"message": f"Reprocessing {doc['original_filename']}"}
 
 
-@router.post("/reprocess-all")
-async def reprocess_all_documents(background_tasks: BackgroundTasks):
-    """Reprocess all documents."""
-    docs = _load_docs()
+def _reset_all_for_reprocess() -> list[tuple[str, str, str]]:
+    """Reset every document that has its file and no ingest job in flight."""
     doc_tasks = []
-    for doc_id, doc in docs.items():
+    for doc in document_store.list_docs():
+        doc_id = doc["id"]
         filepath = os.path.join(UPLOAD_DIR, doc["filename"])
-        if not os.path.exists(filepath):
+        if not os.path.exists(filepath) or job_queue.has_active(INGEST, doc_id):
             continue
-        try:
-            delete_document_from_store(doc_id)
-        except Exception:
-            pass
-        _update_doc(doc_id, {"status": "uploaded"})
+        _reset_for_reprocess(doc_id)
         doc_tasks.append((doc_id, filepath, doc["original_filename"]))
+    return doc_tasks
+
+
+@router.post("/reprocess-all")
+async def reprocess_all_documents(refresh: bool = False):
+    """Reprocess all documents."""
+    doc_tasks = await run_blocking(_reset_all_for_reprocess)
 
     if doc_tasks:
-        background_tasks.add_task(_process_documents_sequential, doc_tasks)
+        await ingest_pipeline.submit(doc_tasks, refresh=refresh)
 
     return {"message": f"Reprocessing {len(doc_tasks)} documents"}
 
 
+def _load_demo_file(filename: str) -> tuple[DocumentMetadata, str, bool]:
+    """Copy one demo PDF into uploads (or share an identical stored file) and register it.
+
+    Returns (metadata, path on disk, whether it still needs processing).
+    """
+    src_path = os.path.join(DEMO_DOCS_DIR, filename)
+    doc_id = generate_doc_id()
+    content_hash = hash_file(src_path)
+
+    duplicate = _find_duplicate(content_hash)
+    if duplicate:
+        stored_filename = duplicate["filename"]
+    else:
+        stored_filename = f"{doc_id}_{filename}"
+        shutil.copy2(src_path, os.path.join(UPLOAD_DIR, stored_filename))
+    dest_path = os.path.join(UPLOAD_DIR, stored_filename)
+    set_content_hash(dest_path, content_hash)
+
+    doc_meta = DocumentMetadata(
+        id=doc_id,
+        filename=stored_filename,
+        original_filename=filename,
+        file_size=os.path.getsize(src_path),
+        content_hash=content_hash,
+        status="uploaded",
+        upload_date=datetime.now().isoformat(),
+    )
+    needs_processing = _register_document(doc_meta, duplicate, "Loaded")
+    return doc_meta, dest_path, needs_processing
+
+
+def _list_demo_files() -> list[str] | None:
+    if not os.path.exists(DEMO_DOCS_DIR):
+        return None
+    return sorted(f for f in os.listdir(DEMO_DOCS_DIR) if f.endswith(".pdf"))
+
+
 @router.post("/demo/load", response_model=list[DocumentMetadata])
-async def load_demo_documents(background_tasks: BackgroundTasks):
+async def load_demo_documents():
     """Load the 5 demo VC memo documents."""
-    ensure_dirs()
+    await run_blocking(ensure_dirs)
     results = []
     doc_tasks = []
 
-    if not os.path.exists(DEMO_DOCS_DIR):
+    pdf_files = await run_blocking(_list_demo_files)
+    if pdf_files is None:
         raise HTTPException(404, "Demo documents directory not found")
-
-    pdf_files = [f for f in os.listdir(DEMO_DOCS_DIR) if f.endswith(".pdf")]
     if not pdf_files:
         raise HTTPException(404, "No demo documents found")
 
-    for filename in sorted(pdf_files):
-        src_path = os.path.join(DEMO_DOCS_DIR, filename)
-        doc_id = generate_doc_id()
-        dest_path = os.path.join(UPLOAD_DIR, f"{doc_id}_{filename}")
-        shutil.copy2(src_path, dest_path)
-
-        file_size = os.path.getsize(src_path)
-        doc_meta = DocumentMetadata(
-            id=doc_id,
-            filename=f"{doc_id}_{filename}",
-            original_filename=filename,
-            file_size=file_size,
-            status="uploaded",
-            upload_date=datetime.now().isoformat(),
-        )
-
-        docs = _load_docs()
-        docs[doc_id] = doc_meta.model_dump()
-        _save_docs(docs)
-
-        _emit_progress(doc_id, "upload", "completed", f"Loaded: {filename}", 5)
-        doc_tasks.append((doc_id, dest_path, filename))
+    for filename in pdf_files:
+        doc_meta, dest_path, needs_processing = await run_blocking(_load_demo_file, filename)
+        if needs_processing:
+            doc_tasks.append((doc_meta.id, dest_path, filename))
         results.append(doc_meta)
 
     if doc_tasks:
-        background_tasks.add_task(_process_documents_sequential, doc_tasks)
+        await ingest_pipeline.submit(doc_tasks)
 
     return results
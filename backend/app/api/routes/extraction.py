@@ -1,52 +1,57 @@
 import os
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import Response
 from app.models.extraction import ExtractionResult
-from app.services.extraction_service import extract_document, get_cached_extraction
-from app.utils.file_utils import load_json
+from app.db import document_store
+from app.services.extraction_service import extract_document_async, get_cached_extraction, get_cached_extraction_with_json
+from app.utils.async_utils import run_blocking
 
 router = APIRouter(prefix="/extraction", tags=["extraction"])
 
-DOCS_STORE_PATH = "data/documents.json"
-
 
 def _get_doc(doc_id: str) -> dict:
-    docs = load_json(DOCS_STORE_PATH) or {}
-    if doc_id not in docs:
+    doc = document_store.get_doc(doc_id)
+    if doc is None:
         raise HTTPException(404, "Document not found")
-    return docs[doc_id]
+    return doc
 
 
 @router.get("/results/{doc_id}", response_model=ExtractionResult)
 async def get_extraction_results(doc_id: str):
     """Get extraction results for a document."""
-    _get_doc(doc_id)
-    cached = get_cached_extraction(doc_id)
+    await run_blocking(_get_doc, doc_id)
+    cached = await run_blocking(get_cached_extraction, doc_id)
     if cached:
         return cached
     return ExtractionResult(doc_id=doc_id, status="pending")
 
 
+def _all_extractions_json() -> bytes:
+    """JSON array of every document's extraction (or a pending placeholder), from cached serializations."""
+    parts = []
+    for doc_id in document_store.list_doc_ids():
+        cached = get_cached_extraction_with_json(doc_id)
+        if cached:
+            parts.append(cached[1])
+        else:
+            parts.append(ExtractionResult(doc_id=doc_id, status="pending").model_dump_json().encode())
+    return b"[" + b",".join(parts) + b"]"
+
+
 @router.get("/results", response_model=list[ExtractionResult])
 async def get_all_extractions():
     """Get extraction results for all documents."""
-    docs = load_json(DOCS_STORE_PATH) or {}
-    results = []
-    for doc_id in docs:
-        cached = get_cached_extraction(doc_id)
-        if cached:
-            results.append(cached)
-        else:
-            results.append(ExtractionResult(doc_id=doc_id, status="pending"))
-    return results
+    content = await run_blocking(_all_extractions_json)
+    return Response(content=content, media_type="application/json")
 
 
 @router.post("/process/{doc_id}", response_model=ExtractionResult)
-async def trigger_extraction(doc_id: str, background_tasks: BackgroundTasks):
-    """Manually trigger extraction for a document."""
-    doc = _get_doc(doc_id)
+async def trigger_extraction(doc_id: str, background_tasks: BackgroundTasks, refresh: bool = False):
+    """Manually trigger extraction for a document. refresh=true bypasses the LLM response cache."""
+    doc = await run_blocking(_get_doc, doc_id)
     filepath = os.path.join("uploads", doc["filename"])
-    if not os.path.exists(filepath):
+    if not await run_blocking(os.path.exists, filepath):
         raise HTTPException(404, "Document file not found")
 
-    result = extract_document(doc_id, filepath)
+    result = await extract_document_async(doc_id, filepath, refresh=refresh)
     return result
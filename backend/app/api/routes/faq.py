@@ -1,83 +1,56 @@
 import os
-import threading
 from fastapi import APIRouter, HTTPException
-from app.services.faq_service import generate_faqs, get_cached_faqs, set_faq_status
-from app.utils.file_utils import load_json
+from app.db import document_store, job_queue
+from app.services.faq_service import get_cached_faqs, set_faq_status
+from app.utils.async_utils import run_blocking
 
 router = APIRouter(prefix="/faq", tags=["faq"])
 
-DOCS_STORE_PATH = "data/documents.json"
-
-# Track which docs are currently generating FAQs
-_generating: set[str] = set()
-
 
 def _get_doc(doc_id: str) -> dict:
-    docs = load_json(DOCS_STORE_PATH) or {}
-    if doc_id not in docs:
+    doc = document_store.get_doc(doc_id)
+    if doc is None:
         raise HTTPException(404, "Document not found")
-    return docs[doc_id]
-
+    return doc
 
-def _generate_in_background(doc_id: str, doc_name: str, filepath: str):
-    """Run FAQ generation in a thread so it doesn't block."""
-    try:
-        generate_faqs(doc_id, doc_name, filepath)
-    finally:
-        _generating.discard(doc_id)
 
-
-@router.post("/generate/{doc_id}")
-async def trigger_faq_generation(doc_id: str):
-    """Start FAQ generation in background."""
-    doc = _get_doc(doc_id)
+async def _queue_generation(doc_id: str, message: str, refresh: bool = False) -> dict:
+    """Queue an FAQ job for the ingest workers unless one is already queued or running."""
+    doc = await run_blocking(_get_doc, doc_id)
     filepath = os.path.join("uploads", doc["filename"])
-    if not os.path.exists(filepath):
+    if not await run_blocking(os.path.exists, filepath):
         raise HTTPException(404, "Document file not found")
 
-    if doc_id in _generating:
+    if await run_blocking(job_queue.has_active, "faq", doc_id):
         return {"doc_id": doc_id, "status": "generating", "message": "Already generating"}
 
-    _generating.add(doc_id)
-    set_faq_status(doc_id, doc["original_filename"], "generating")
+    await run_blocking(set_faq_status, doc_id, doc["original_filename"], "generating")
+    payload = {"filepath": filepath, "doc_name": doc["original_filename"], "refresh": refresh}
+    await run_blocking(job_queue.enqueue, "faq", doc_id, payload)
+    return {"doc_id": doc_id, "status": "generating", "message": message}
 
-    thread = threading.Thread(target=_generate_in_background, args=(doc_id, doc["original_filename"], filepath))
-    thread.daemon = True
-    thread.start()
 
-    return {"doc_id": doc_id, "status": "generating", "message": "FAQ generation started"}
+@router.post("/generate/{doc_id}")
+async def trigger_faq_generation(doc_id: str):
+    """Start FAQ generation in background."""
+    return await _queue_generation(doc_id, "FAQ generation started")
 
 
 @router.get("/get/{doc_id}")
 async def get_faqs(doc_id: str):
     """Get cached FAQs for a document, or current generation status."""
-    doc = _get_doc(doc_id)
-    cached = get_cached_faqs(doc_id)
+    doc = await run_blocking(_get_doc, doc_id)
+    cached = await run_blocking(get_cached_faqs, doc_id)
     if cached:
         return cached.model_dump()
 
-    if doc_id in _generating:
+    if await run_blocking(job_queue.has_active, "faq", doc_id):
         return {"doc_id": doc_id, "doc_name": doc["original_filename"], "faqs": [], "status": "generating"}
 
     return {"doc_id": doc_id, "doc_name": doc["original_filename"], "faqs": [], "status": "pending"}
 
 
 @router.post("/regenerate/{doc_id}")
-async def regenerate_faqs(doc_id: str):
-    """Regenerate FAQs for a document."""
-    doc = _get_doc(doc_id)
-    filepath = os.path.join("uploads", doc["filename"])
-    if not os.path.exists(filepath):
-        raise HTTPException(404, "Document file not found")
-
-    if doc_id in _generating:
-        return {"doc_id": doc_id, "status": "generating", "message": "Already generating"}
-
-    _generating.add(doc_id)
-    set_faq_status(doc_id, doc["original_filename"], "generating")
-
-    thread = threading.Thread(target=_generate_in_background, args=(doc_id, doc["original_filename"], filepath))
-    thread.daemon = True
-    thread.start()
-
-    return {"doc_id": doc_id, "status": "generating", "message": "FAQ regeneration started"}
+async def regenerate_faqs(doc_id: str, refresh: bool = False):
+    """Regenerate FAQs for a document. refresh=true bypasses the LLM response cache."""
+    return await _queue_generation(doc_id, "FAQ regeneration started", refresh)
@@ -5,11 +5,77 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+# Chroma server to use instead of the embedded store in CHROMA_DB_PATH. Required when more than one
+# process (API workers, ingest workers) reads or writes vectors: the embedded index is per process.
+CHROMA_HOST = os.getenv("CHROMA_HOST", "")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
 DEMO_DOCS_DIR = os.getenv("DEMO_DOCS_DIR", "./demo_documents")
 MAX_FILE_SIZE_MB = 20
 MAX_BATCH_SIZE = 10
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "600"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "120"))
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))  # 0 = model default
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))  # API cap is 300k tokens per request
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "0"))  # seconds, 0 = no expiry
 LLM_MODEL = "gpt-4-turbo-preview"
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "128000"))  # LLM_MODEL's context window
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "4096"))  # completion tokens reserved per call
+# Cap on prompt tokens, about the old 100k-character cutoff; raise it to send more of long documents (0 = whole window)
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "25000"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "6000"))  # retrieved chunks per Q&A prompt
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "").lower() in ("1", "true", "yes")  # opt-in completion cache
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "full")  # full: whole document in one prompt; targeted: top-k chunks per field group
+EXTRACTION_TOP_K = int(os.getenv("EXTRACTION_TOP_K", "6"))
+# At ingest, produce extraction and FAQs from one full-text call (only applies with EXTRACTION_MODE=full)
+INGEST_COMBINED_ANALYSIS = os.getenv("INGEST_COMBINED_ANALYSIS", "true").lower() in ("1", "true", "yes")
+# Account rate limits used for client-side admission (set these to your OpenAI tier)
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "300000"))
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+# Processes (API workers + ingest workers) sharing those limits; defaults to WEB_CONCURRENCY, which uvicorn reads as its worker count
+RATE_LIMIT_PROCESSES = int(os.getenv("RATE_LIMIT_PROCESSES", os.getenv("WEB_CONCURRENCY", "1")))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_EXTRACT_ENGINE = os.getenv("PDF_EXTRACT_ENGINE", "pdfplumber")  # pdfplumber, pdfminer, pypdfium2
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+LOOP_STALL_DEBUG = os.getenv("LOOP_STALL_DEBUG", "").lower() in ("1", "true", "yes")
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(PDF_EXTRACT_WORKERS)))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+DOCUMENT_DB_PATH = os.getenv("DOCUMENT_DB_PATH", "data/documents.sqlite3")
+CHAT_DB_PATH = os.getenv("CHAT_DB_PATH", "data/chat_sessions.sqlite3")
+QA_HISTORY_PATH = os.getenv("QA_HISTORY_PATH", "data/qa_history.jsonl")
+QA_HISTORY_MAX_BYTES = int(os.getenv("QA_HISTORY_MAX_BYTES", str(10 * 1024 * 1024)))  # rotate the live log past this size
+QA_HISTORY_KEEP_SEGMENTS = int(os.getenv("QA_HISTORY_KEEP_SEGMENTS", "10"))  # compressed rotated logs to keep
+QA_HISTORY_MAX_AGE_DAYS = float(os.getenv("QA_HISTORY_MAX_AGE_DAYS", "0"))  # drop rotated logs older than this, 0 = never
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+INGEST_FAQ_WORKERS = int(os.getenv("INGEST_FAQ_WORKERS", "2"))
+INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "16"))
+# Set to false when ingest runs in separate `python -m app.worker` processes; the API then only enqueues
+INGEST_IN_API_PROCESS = os.getenv("INGEST_IN_API_PROCESS", "true").lower() in ("1", "true", "yes")
+PROGRESS_HISTORY_PER_DOC = int(os.getenv("PROGRESS_HISTORY_PER_DOC", "50"))  # events kept per document for replay
+PROGRESS_HISTORY_TTL = float(os.getenv("PROGRESS_HISTORY_TTL", str(6 * 3600)))  # seconds before events stop being replayed
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "0.25"))  # picks up events written by worker processes
+PROGRESS_SUBSCRIBER_QUEUE = int(os.getenv("PROGRESS_SUBSCRIBER_QUEUE", "256"))
+PROGRESS_STREAM_IDLE_TIMEOUT = float(os.getenv("PROGRESS_STREAM_IDLE_TIMEOUT", "150"))
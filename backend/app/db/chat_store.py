@@ -0,0 +1,158 @@
+"""Chat session store.
+
+Each session is a row with its title and a cached message count, and each
+message is a row of its own. Appending a message inserts one row and bumps
+the count, and listing sessions never touches message bodies. Sessions from
+the old data/qa_sessions.json are imported the first time the store is opened.
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from app.config import CHAT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+LEGACY_JSON_PATH = "data/qa_sessions.json"
+TITLE_LENGTH = 50
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CHAT_DB_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(CHAT_DB_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("PRAGMA foreign_keys=ON")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID"""
+        )
+        _migrate_legacy_json(_conn)
+    return _conn
+
+
+def _transaction(conn: sqlite3.Connection, work):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = work()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return result
+
+
+def _migrate_legacy_json(conn: sqlite3.Connection):
+    """One-time import of data/qa_sessions.json; the file is renamed afterwards."""
+    if not os.path.exists(LEGACY_JSON_PATH):
+        return
+
+    def work():
+        # Another process may have migrated while this one waited for the write lock
+        if not os.path.exists(LEGACY_JSON_PATH):
+            return
+        with open(LEGACY_JSON_PATH, "r") as f:
+            sessions = json.load(f) or []
+        for s in sessions:
+            messages = s.get("messages", [])
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, title, created_at, updated_at, message_count) VALUES (?, ?, ?, ?, ?)",
+                (s["id"], s["title"], s["created_at"], s["updated_at"], len(messages)),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO messages (session_id, seq, body) VALUES (?, ?, ?)",
+                [(s["id"], i, json.dumps(m)) for i, m in enumerate(messages)],
+            )
+        os.replace(LEGACY_JSON_PATH, f"{LEGACY_JSON_PATH}.migrated")
+        logger.info(f"Migrated {len(sessions)} chat sessions to {CHAT_DB_PATH}")
+
+    _transaction(conn, work)
+
+
+def create_session(session_id: str, title: str = "New Chat") -> dict:
+    now = datetime.now().isoformat()
+    with _lock:
+        _get_conn().execute(
+            "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (session_id, title, now, now),
+        )
+    return {"id": session_id, "title": title, "created_at": now, "updated_at": now, "messages": []}
+
+
+def list_sessions() -> list[dict]:
+    """Session summaries (no messages), newest first."""
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT id, title, created_at, updated_at, message_count FROM sessions ORDER BY created_at DESC"
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_session(session_id: str) -> dict | None:
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT id, title, created_at, updated_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = conn.execute(
+            "SELECT body FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+    session = dict(row)
+    session["messages"] = [json.loads(m["body"]) for m in messages]
+    return session
+
+
+def add_message(session_id: str, message: dict) -> bool:
+    """Append a message. The first user message becomes the session title. Returns False for unknown sessions."""
+    with _lock:
+        conn = _get_conn()
+
+        def work() -> bool:
+            row = conn.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return False
+            count = row["message_count"]
+            conn.execute(
+                "INSERT INTO messages (session_id, seq, body) VALUES (?, ?, ?)",
+                (session_id, count, json.dumps(message)),
+            )
+            updates = {"message_count": count + 1, "updated_at": datetime.now().isoformat()}
+            if count == 0 and message.get("role") == "user":
+                content = message["content"]
+                updates["title"] = content[:TITLE_LENGTH] + ("..." if len(content) > TITLE_LENGTH else "")
+            conn.execute(
+                f"UPDATE sessions SET {', '.join(f'{c} = ?' for c in updates)} WHERE id = ?",
+                [*updates.values(), session_id],
+            )
+            return True
+
+        return _transaction(conn, work)
+
+
+def delete_session(session_id: str):
+    with _lock:
+        _get_conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
@@ -1,13 +1,22 @@
+import threading
 import chromadb
-from app.config import CHROMA_DB_PATH
+from app.config import CHROMA_DB_PATH, CHROMA_HOST, CHROMA_PORT
 
 _client = None
+_lock = threading.Lock()
 
 
 def get_chroma_client() -> chromadb.ClientAPI:
     global _client
     if _client is None:
-        _client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        # Embed workers and API lookups can arrive together; concurrent first-time
+        # clients on a fresh store fail with "Could not connect to tenant"
+        with _lock:
+            if _client is None:
+                if CHROMA_HOST:
+                    _client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+                else:
+                    _client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
     return _client
 
 
@@ -0,0 +1,158 @@
+"""Document metadata store, one SQLite row per document.
+
+Shared by the API and the standalone ingest worker. WAL mode lets any number
+of processes read while one writes, and status changes are single-row
+updates instead of rewriting every document. Documents from the old
+data/documents.json are imported the first time the database is opened.
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+from app.config import DOCUMENT_DB_PATH
+from app.models.document import DocumentMetadata
+
+logger = logging.getLogger(__name__)
+
+LEGACY_JSON_PATH = "data/documents.json"
+
+_conn = None
+_lock = threading.Lock()
+
+_COLUMNS = list(DocumentMetadata.model_fields)
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DOCUMENT_DB_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(DOCUMENT_DB_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                original_filename TEXT NOT NULL,
+                file_size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL DEFAULT '',
+                page_count INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'uploaded',
+                upload_date TEXT NOT NULL DEFAULT '',
+                error_message TEXT
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_upload_date ON documents (upload_date)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename)")
+        _migrate_legacy_json(_conn)
+    return _conn
+
+
+def _migrate_legacy_json(conn: sqlite3.Connection):
+    """One-time import of data/documents.json; the file is renamed afterwards so it isn't imported twice."""
+    if not os.path.exists(LEGACY_JSON_PATH):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while this one waited for the write lock
+        if os.path.exists(LEGACY_JSON_PATH):
+            with open(LEGACY_JSON_PATH, "r") as f:
+                docs = json.load(f) or {}
+            for doc in docs.values():
+                _insert(conn, DocumentMetadata(**doc).model_dump(), replace=True)
+            os.replace(LEGACY_JSON_PATH, f"{LEGACY_JSON_PATH}.migrated")
+            logger.info(f"Migrated {len(docs)} documents from {LEGACY_JSON_PATH} to {DOCUMENT_DB_PATH}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _insert(conn: sqlite3.Connection, doc: dict, replace: bool = False):
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    conn.execute(
+        f"{verb} INTO documents ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+        [doc.get(c) for c in _COLUMNS],
+    )
+
+
+def get_doc(doc_id: str) -> dict | None:
+    with _lock:
+        row = _get_conn().execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_docs(status: str | None = None) -> list[dict]:
+    """All documents, newest upload first, optionally filtered by status."""
+    with _lock:
+        if status is None:
+            rows = _get_conn().execute("SELECT * FROM documents ORDER BY upload_date DESC").fetchall()
+        else:
+            rows = _get_conn().execute(
+                "SELECT * FROM documents WHERE status = ? ORDER BY upload_date DESC", (status,)
+            ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def list_doc_ids() -> list[str]:
+    with _lock:
+        rows = _get_conn().execute("SELECT id FROM documents ORDER BY upload_date DESC").fetchall()
+    return [row["id"] for row in rows]
+
+
+def find_by_content_hash(content_hash: str) -> list[dict]:
+    with _lock:
+        rows = _get_conn().execute("SELECT * FROM documents WHERE content_hash = ?", (content_hash,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def filename_in_use(filename: str) -> bool:
+    """Whether any document still references this stored file."""
+    with _lock:
+        row = _get_conn().execute("SELECT 1 FROM documents WHERE filename = ? LIMIT 1", (filename,)).fetchone()
+    return row is not None
+
+
+def insert_doc(doc: dict):
+    with _lock:
+        _insert(_get_conn(), doc)
+
+
+def update_doc(doc_id: str, updates: dict):
+    """Update some of a document's fields; unknown document ids are ignored."""
+    fields = [c for c in updates if c in _COLUMNS and c != "id"]
+    if not fields:
+        return
+    with _lock:
+        _get_conn().execute(
+            f"UPDATE documents SET {', '.join(f'{c} = ?' for c in fields)} WHERE id = ?",
+            [updates[c] for c in fields] + [doc_id],
+        )
+
+
+def _delete_where(where: str, params: tuple) -> list[dict]:
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(f"SELECT * FROM documents {where}", params).fetchall()
+            conn.execute(f"DELETE FROM documents {where}", params)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return [dict(row) for row in rows]
+
+
+def delete_doc(doc_id: str) -> dict | None:
+    """Delete a document's row. Returns the deleted record, or None if it didn't exist."""
+    deleted = _delete_where("WHERE id = ?", (doc_id,))
+    return deleted[0] if deleted else None
+
+
+def delete_all_docs() -> list[dict]:
+    return _delete_where("", ())
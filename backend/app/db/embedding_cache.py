@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from app.config import EMBEDDING_CACHE_PATH
+
+_conn = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0}
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 500
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(EMBEDDING_CACHE_PATH, timeout=30, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            ) WITHOUT ROWID"""
+        )
+        _conn.commit()
+    return _conn
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_many(model: str, dimensions: int, hashes: list[str]) -> dict[str, list[float]]:
+    """Look up cached embeddings. Returns {text_hash: vector} for the hashes that were found."""
+    wanted = list(dict.fromkeys(hashes))
+    found = {}
+    with _lock:
+        conn = _get_conn()
+        for i in range(0, len(wanted), _LOOKUP_BATCH):
+            batch = wanted[i:i + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                [model, dimensions, *batch],
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(wanted) - len(found)
+    return found
+
+
+def put_many(model: str, dimensions: int, vectors: dict[str, list[float]]):
+    """Store embeddings as float32 blobs keyed by text hash."""
+    if not vectors:
+        return
+    rows = [(model, dimensions, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in vectors.items()]
+    with _lock:
+        conn = _get_conn()
+        conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        _stats["writes"] += len(rows)
+
+
+def get_stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,278 @@
+"""SQLite-backed job queue shared by every process on the box.
+
+Jobs are claimed under a lease. A worker that dies stops renewing its lease,
+and once the lease expires the job can be claimed again by any worker. Jobs
+record the last stage they completed, so a reclaimed job resumes from there
+instead of starting over.
+
+Progress events live in the same database, so the API can stream progress
+for work running in a separate worker process.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from app.config import JOB_QUEUE_PATH, JOB_MAX_ATTEMPTS, PROGRESS_HISTORY_PER_DOC, PROGRESS_HISTORY_TTL
+
+_conn = None
+_lock = threading.Lock()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(JOB_QUEUE_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(JOB_QUEUE_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, available_at)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_doc ON jobs (doc_id, kind, status)")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS progress (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_doc ON progress (doc_id, id)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_created_at ON progress (created_at)")
+    return _conn
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue(kind: str, doc_id: str, payload: dict) -> int:
+    """Queue a job, or return the id of the job already queued or running for this doc and kind."""
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE doc_id = ? AND kind = ? AND status IN (?, ?)",
+                (doc_id, kind, QUEUED, RUNNING),
+            ).fetchone()
+            if row:
+                job_id = row["id"]
+            else:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, doc_id, payload, status, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, doc_id, json.dumps(payload), QUEUED, now, now, now),
+                ).lastrowid
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return job_id
+
+
+def claim(worker_id: str, kinds: list[str], lease_seconds: float) -> dict | None:
+    """Lease the oldest available job: queued and due, or running with an expired lease."""
+    now = time.time()
+    placeholders = ",".join("?" * len(kinds))
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({placeholders}) AND "
+                f"((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?)) "
+                f"ORDER BY available_at, id LIMIT 1",
+                (*kinds, QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now + lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    job = _row_to_job(row)
+    job.update(status=RUNNING, lease_owner=worker_id, attempts=job["attempts"] + 1)
+    return job
+
+
+def _update_owned(job_id: int, worker_id: str, sql: str, params: tuple) -> bool:
+    """Apply an update only while worker_id still holds the job's lease."""
+    with _lock:
+        cursor = _get_conn().execute(
+            f"UPDATE jobs SET {sql}, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (*params, time.time(), job_id, worker_id, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+
+def renew_leases(job_ids: list[int], worker_id: str, lease_seconds: float) -> list[int]:
+    """Extend leases on in-flight jobs. Returns the ids whose lease this worker has lost."""
+    return [
+        job_id for job_id in job_ids
+        if not _update_owned(job_id, worker_id, "lease_expires = ?", (time.time() + lease_seconds,))
+    ]
+
+
+def checkpoint(job_id: int, worker_id: str, stage: str) -> bool:
+    """Record the last stage a job completed."""
+    return _update_owned(job_id, worker_id, "stage = ?", (stage,))
+
+
+def complete(job_id: int, worker_id: str) -> bool:
+    return _update_owned(job_id, worker_id, "status = ?, lease_owner = NULL, lease_expires = NULL", (DONE,))
+
+
+def release(job_ids: list[int], worker_id: str):
+    """Hand in-flight jobs back to the queue on shutdown, keeping their checkpoints.
+
+    The interrupted attempt doesn't count towards JOB_MAX_ATTEMPTS.
+    """
+    for job_id in job_ids:
+        _update_owned(
+            job_id, worker_id,
+            "status = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1, available_at = ?",
+            (QUEUED, time.time()),
+        )
+
+
+def fail(job_id: int, worker_id: str, attempts: int, error: str) -> bool:
+    """Requeue a failed job with exponential backoff, or mark it failed after JOB_MAX_ATTEMPTS.
+
+    Returns True if the job will be retried.
+    """
+    if attempts < JOB_MAX_ATTEMPTS:
+        retry_at = time.time() + min(2 ** attempts * 5, 300)
+        _update_owned(
+            job_id, worker_id,
+            "status = ?, lease_owner = NULL, lease_expires = NULL, available_at = ?, error = ?",
+            (QUEUED, retry_at, error),
+        )
+        return True
+    _update_owned(job_id, worker_id, "status = ?, lease_owner = NULL, lease_expires = NULL, error = ?", (FAILED, error))
+    return False
+
+
+def has_active(kind: str, doc_id: str) -> bool:
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT 1 FROM jobs WHERE doc_id = ? AND kind = ? AND status IN (?, ?) LIMIT 1",
+            (doc_id, kind, QUEUED, RUNNING),
+        ).fetchone()
+    return row is not None
+
+
+def cancel_for_doc(doc_id: str):
+    """Drop queued jobs for a deleted document. Running jobs finish or fail on their own."""
+    with _lock:
+        _get_conn().execute("DELETE FROM jobs WHERE doc_id = ? AND status = ?", (doc_id, QUEUED))
+
+
+def purge_finished(older_than_seconds: float = 7 * 24 * 3600):
+    cutoff = time.time() - older_than_seconds
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff))
+    prune_progress()
+
+
+def record_progress(doc_id: str, step: str, status: str, detail: str = "", progress: int = 0) -> int:
+    """Store a progress event for a document, keeping only its last PROGRESS_HISTORY_PER_DOC events.
+
+    Returns the event id (used as the SSE event id).
+    """
+    event = {
+        "doc_id": doc_id,
+        "step": step,
+        "status": status,
+        "detail": detail,
+        "progress": progress,
+        "timestamp": datetime.now().isoformat(),
+    }
+    with _lock:
+        conn = _get_conn()
+        event_id = conn.execute(
+            "INSERT INTO progress (doc_id, event, created_at) VALUES (?, ?, ?)",
+            (doc_id, json.dumps(event), time.time()),
+        ).lastrowid
+        conn.execute(
+            "DELETE FROM progress WHERE doc_id = ? AND id <= "
+            "(SELECT id FROM progress WHERE doc_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (doc_id, doc_id, PROGRESS_HISTORY_PER_DOC),
+        )
+    return event_id
+
+
+def progress_since(last_id: int, doc_id: str | None = None, limit: int = 500) -> list[tuple[int, dict]]:
+    """Unexpired progress events with id > last_id, oldest first, optionally for one document."""
+    params: tuple = (last_id, time.time() - PROGRESS_HISTORY_TTL)
+    where = "id > ? AND created_at >= ?"
+    if doc_id is not None:
+        where += " AND doc_id = ?"
+        params += (doc_id,)
+    with _lock:
+        rows = _get_conn().execute(
+            f"SELECT id, event FROM progress WHERE {where} ORDER BY id LIMIT ?", (*params, limit)
+        ).fetchall()
+    return [(row["id"], json.loads(row["event"])) for row in rows]
+
+
+def last_progress_id() -> int:
+    with _lock:
+        row = _get_conn().execute("SELECT MAX(id) AS id FROM progress").fetchone()
+    return row["id"] or 0
+
+
+def prune_progress():
+    """Delete progress events older than PROGRESS_HISTORY_TTL."""
+    with _lock:
+        _get_conn().execute("DELETE FROM progress WHERE created_at < ?", (time.time() - PROGRESS_HISTORY_TTL,))
+
+
+def clear_progress(doc_id: str | None = None):
+    with _lock:
+        if doc_id is None:
+            _get_conn().execute("DELETE FROM progress")
+        else:
+            _get_conn().execute("DELETE FROM progress WHERE doc_id = ?", (doc_id,))
+
+
+def get_stats() -> dict:
+    with _lock:
+        rows = _get_conn().execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status").fetchall()
+    stats: dict[str, dict[str, int]] = {}
+    for row in rows:
+        stats.setdefault(row["kind"], {})[row["status"]] = row["n"]
+    return stats
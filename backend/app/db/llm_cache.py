@@ -0,0 +1,87 @@
+"""Persistent cache of chat completion responses, keyed by request fingerprint.
+
+The key hashes everything that shapes the output (model, messages,
+temperature, max_tokens, response_format), so an identical request on an
+unchanged document is answered from disk. The cache holds at most
+LLM_CACHE_MAX_ENTRIES responses and evicts the least recently used.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from app.config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+
+_conn = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+_FINGERPRINT_KEYS = ("model", "messages", "temperature", "max_tokens", "response_format")
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        _conn.commit()
+    return _conn
+
+
+def fingerprint(request_kwargs: dict) -> str:
+    payload = {k: request_kwargs.get(k) for k in _FINGERPRINT_KEYS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> str | None:
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        _stats["hits"] += 1
+    return row[0]
+
+
+def put(key: str, model: str, response: str):
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, response, now, now))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - LLM_CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            _stats["evictions"] += excess
+        conn.commit()
+        _stats["writes"] += 1
+
+
+def get_stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        entries = _get_conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0] if LLM_CACHE_ENABLED else 0
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            **_stats,
+            "entries": entries,
+            "max_entries": LLM_CACHE_MAX_ENTRIES,
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,128 @@
+"""Append-only Q&A history log.
+
+Entries are JSON lines appended to QA_HISTORY_PATH, so recording a question
+costs one small write however long the history is. Reads walk the log
+backwards from the end in blocks and stop once they have enough entries.
+When the live log grows past QA_HISTORY_MAX_BYTES it is rotated into a
+gzip-compressed segment. The newest QA_HISTORY_KEEP_SEGMENTS segments are
+kept, and segments older than QA_HISTORY_MAX_AGE_DAYS are dropped.
+"""
+import os
+import glob
+import gzip
+import json
+import time
+import logging
+from typing import Iterator
+from app.config import QA_HISTORY_PATH, QA_HISTORY_MAX_BYTES, QA_HISTORY_KEEP_SEGMENTS, QA_HISTORY_MAX_AGE_DAYS
+from app.utils.file_utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+LEGACY_JSON_PATH = "data/qa_history.json"
+
+_READ_BLOCK = 64 * 1024
+
+
+def _segment_paths() -> list[str]:
+    """Rotated segments, newest first (names embed a sortable timestamp)."""
+    base, _ = os.path.splitext(QA_HISTORY_PATH)
+    return sorted(glob.glob(f"{base}.*.jsonl.gz"), reverse=True)
+
+
+def _migrate_legacy_json():
+    """Convert the old single-array qa_history.json into the JSONL log, once."""
+    if not os.path.exists(LEGACY_JSON_PATH):
+        return
+    with open(LEGACY_JSON_PATH, "r") as f:
+        entries = json.load(f) or []
+    # Rotate as the log fills, like append() does, so no segment ends up much larger than QA_HISTORY_MAX_BYTES
+    f = open(QA_HISTORY_PATH, "a")
+    try:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+            if f.tell() > QA_HISTORY_MAX_BYTES:
+                f.close()
+                _rotate()
+                f = open(QA_HISTORY_PATH, "a")
+    finally:
+        f.close()
+    os.replace(LEGACY_JSON_PATH, f"{LEGACY_JSON_PATH}.migrated")
+    logger.info(f"Migrated {len(entries)} Q&A history entries to {QA_HISTORY_PATH}")
+
+
+def _rotate():
+    base, _ = os.path.splitext(QA_HISTORY_PATH)
+    segment = f"{base}.{time.time_ns()}.jsonl.gz"
+    with open(QA_HISTORY_PATH, "rb") as src, gzip.open(segment, "wb") as dst:
+        for block in iter(lambda: src.read(_READ_BLOCK), b""):
+            dst.write(block)
+    os.remove(QA_HISTORY_PATH)
+    logger.info(f"Rotated Q&A history into {segment}")
+
+    cutoff = time.time() - QA_HISTORY_MAX_AGE_DAYS * 86400
+    for i, path in enumerate(_segment_paths()):
+        if i >= QA_HISTORY_KEEP_SEGMENTS or (QA_HISTORY_MAX_AGE_DAYS and os.path.getmtime(path) < cutoff):
+            os.remove(path)
+
+
+def append(entry: dict):
+    """Append one history entry, rotating the log if it has grown too large."""
+    os.makedirs(os.path.dirname(QA_HISTORY_PATH) or ".", exist_ok=True)
+    line = json.dumps(entry) + "\n"
+    with file_lock(QA_HISTORY_PATH):
+        _migrate_legacy_json()
+        with open(QA_HISTORY_PATH, "a") as f:
+            f.write(line)
+            size = f.tell()
+        if size > QA_HISTORY_MAX_BYTES:
+            _rotate()
+
+
+def _reverse_lines(path: str) -> Iterator[bytes]:
+    """Lines of a file from last to first, reading backwards in blocks."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            step = min(_READ_BLOCK, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if remainder:
+            yield remainder
+
+
+def _iter_newest_first() -> Iterator[dict]:
+    if os.path.exists(QA_HISTORY_PATH):
+        for line in _reverse_lines(QA_HISTORY_PATH):
+            yield json.loads(line)
+    for path in _segment_paths():
+        # Segments are rotated (by append() and the legacy migration) once they pass QA_HISTORY_MAX_BYTES,
+        # so reading one whole is bounded
+        with gzip.open(path, "rb") as f:
+            lines = f.read().splitlines()
+        for line in reversed(lines):
+            if line:
+                yield json.loads(line)
+
+
+def tail(limit: int = 50, offset: int = 0) -> list[dict]:
+    """A page of history in chronological order, skipping the `offset` most recent entries."""
+    if os.path.exists(LEGACY_JSON_PATH):
+        with file_lock(QA_HISTORY_PATH):
+            _migrate_legacy_json()
+    page = []
+    for i, entry in enumerate(_iter_newest_first()):
+        if i < offset:
+            continue
+        page.append(entry)
+        if len(page) >= limit:
+            break
+    page.reverse()
+    return page
@@ -1,7 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import INGEST_IN_API_PROCESS
 from app.api.routes import documents, extraction, comparison, qa, faq
 from app.utils.file_utils import ensure_dirs
+from app.utils.async_utils import (
+    run_blocking, start_loop_stall_monitor, stop_loop_stall_monitor, shutdown_blocking_executor,
+)
+from app.db import embedding_cache, job_queue, llm_cache
+from app.services.llm_service import query_embedding_cache, close_async_openai_client
+from app.services.extraction_service import extraction_cache
+from app.services.faq_service import faq_cache
+from app.services.rate_limiter import llm_scheduler, embedding_scheduler
+from app.services.progress_bus import progress_bus
 
 app = FastAPI(
     title="VC Document Analyzer",
@@ -27,8 +37,46 @@ app.include_router(faq.router, prefix="/api/v1")
 @app.on_event("startup")
 async def startup():
     ensure_dirs()
+    start_loop_stall_monitor()
+    await run_blocking(job_queue.purge_finished)
+    if INGEST_IN_API_PROCESS:
+        documents.ingest_pipeline.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await documents.ingest_pipeline.stop()
+    await close_async_openai_client()
+    stop_loop_stall_monitor()
+    shutdown_blocking_executor()
 
 
 @app.get("/api/v1/health")
 async def health_check():
     return {"status": "healthy", "service": "vc-document-analyzer"}
+
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    return {
+        "embeddings": embedding_cache.get_stats(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "extractions": extraction_cache.stats(),
+        "faqs": faq_cache.stats(),
+        "llm_responses": llm_cache.get_stats(),
+    }
+
+
+@app.get("/api/v1/rate-limits")
+async def rate_limit_stats():
+    return {"chat": llm_scheduler.stats(), "embeddings": embedding_scheduler.stats()}
+
+
+@app.get("/api/v1/jobs/stats")
+async def job_stats():
+    return await run_blocking(job_queue.get_stats)
+
+
+@app.get("/api/v1/progress/stats")
+async def progress_stats():
+    return progress_bus.stats()
@@ -8,6 +8,7 @@ class DocumentMetadata(BaseModel):
     filename: str
     original_filename: str
     file_size: int
+    content_hash: str = ""
     page_count: int = 0
     status: str = "uploaded"  # uploaded, processing, processed, error
     upload_date: str = ""
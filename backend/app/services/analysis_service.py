@@ -0,0 +1,57 @@
+"""Combined document analysis: extraction and FAQs from one GPT-4 call.
+
+Extraction and FAQ generation both send the same full document text. When
+both are needed, as at ingest, one prompt that asks for both saves a
+~25k-token call, and the FAQ page is then served from cache instead of
+triggering a generation on first view.
+"""
+import json
+import logging
+from app.config import EXTRACTION_MODE, INGEST_COMBINED_ANALYSIS
+from app.services.llm_service import TruncatedCompletionError, call_llm_async
+from app.services.extraction_service import document_text_for_prompt, save_extraction_data, extract_document_async
+from app.services.faq_service import parse_faqs, save_faqs
+from app.models.extraction import ExtractionResult
+from app.utils.prompts import ANALYSIS_PROMPT
+from app.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+def combined_analysis_enabled() -> bool:
+    return INGEST_COMBINED_ANALYSIS and EXTRACTION_MODE == "full"
+
+
+def _build_prompt(pdf_path: str) -> str | None:
+    text = document_text_for_prompt(pdf_path, ANALYSIS_PROMPT)
+    if text is None:
+        return None
+    return ANALYSIS_PROMPT.format(document_text=text)
+
+
+async def analyze_document_async(doc_id: str, doc_name: str, pdf_path: str, refresh: bool = False) -> ExtractionResult:
+    """Extract structured data and generate FAQs in one call, saving both artifacts.
+
+    If the response has no usable FAQs, only the extraction is saved and FAQs stay
+    on-demand. If it is cut off or can't be parsed, falls back to a plain extraction
+    call and leaves FAQs on-demand.
+    """
+    prompt = await run_blocking(_build_prompt, pdf_path)
+    if prompt is None:
+        return ExtractionResult(doc_id=doc_id, status="error", error_message="No text extracted from PDF")
+
+    try:
+        response = await call_llm_async(prompt, json_mode=True, refresh=refresh, label="analysis", require_complete=True)
+        data = json.loads(response)
+        if not isinstance(data, dict):
+            raise ValueError("unexpected response shape")
+    except (TruncatedCompletionError, ValueError) as e:  # JSONDecodeError is a ValueError
+        logger.warning(f"[{doc_id}] Combined analysis unusable ({e}); falling back to extraction only")
+        return await extract_document_async(doc_id, pdf_path, mode="full", refresh=refresh)
+
+    faqs = parse_faqs(data.get("faqs") or [])
+    if faqs:
+        await run_blocking(save_faqs, doc_id, doc_name, faqs)
+    else:
+        logger.warning(f"[{doc_id}] Combined analysis returned no FAQs; they will be generated on demand")
+    return await run_blocking(save_extraction_data, doc_id, data.get("extraction") or {})
@@ -1,52 +1,163 @@
 import json
-from app.services.llm_service import call_llm
+import asyncio
+import logging
+from app.config import EXTRACTION_MODE, EXTRACTION_TOP_K
+from app.services.llm_service import call_llm_async, get_query_embedding_async
 from app.services.pdf_processor import extract_full_text
+from app.services.vector_service import query_documents
+from app.services.rag_service import build_context, fit_chunks
 from app.models.extraction import ExtractionResult, Founder, Financials, TAM, Traction, Ask
-from app.utils.prompts import EXTRACTION_PROMPT
-from app.utils.file_utils import save_json, load_json, get_data_path
+from app.utils.prompts import EXTRACTION_PROMPT, EXTRACTION_GROUP_PROMPT, EXTRACTION_FIELD_GROUPS
+from app.utils.file_utils import load_json, get_data_path
+from app.utils.artifact_cache import ArtifactCache
+from app.utils.async_utils import run_blocking
+from app.utils.tokens import truncate_to_tokens, input_budget
 
+logger = logging.getLogger(__name__)
 
-def extract_document(doc_id: str, pdf_path: str) -> ExtractionResult:
-    """Extract structured data from a VC memo PDF using GPT-4."""
+extraction_cache: ArtifactCache[ExtractionResult] = ArtifactCache(ExtractionResult)
+
+
+def document_text_for_prompt(pdf_path: str, template: str = EXTRACTION_PROMPT) -> str | None:
+    """The document's full text, truncated to the tokens left in template, or None if it has no text."""
     text = extract_full_text(pdf_path)
     if not text.strip():
-        return ExtractionResult(doc_id=doc_id, status="error", error_message="No text extracted from PDF")
+        return None
+
+    budget = input_budget(template)
+    truncated = truncate_to_tokens(text, budget)
+    if len(truncated) < len(text):
+        logger.info(f"Truncated {pdf_path} to {budget} tokens ({len(truncated)}/{len(text)} chars)")
+    return truncated
 
-    # Truncate if too long (GPT-4 Turbo has 128K context)
-    if len(text) > 100000:
-        text = text[:100000]
 
-    prompt = EXTRACTION_PROMPT.format(document_text=text)
-    response = call_llm(prompt, json_mode=True)
+def _build_prompt(pdf_path: str) -> str | None:
+    text = document_text_for_prompt(pdf_path, EXTRACTION_PROMPT)
+    if text is None:
+        return None
+    return EXTRACTION_PROMPT.format(document_text=text)
 
+
+def _save_result(doc_id: str, response: str) -> ExtractionResult:
     try:
         data = json.loads(response)
     except json.JSONDecodeError:
         return ExtractionResult(doc_id=doc_id, status="error", error_message="Failed to parse LLM response as JSON")
+    return save_extraction_data(doc_id, data)
+
 
+def save_extraction_data(doc_id: str, data: dict) -> ExtractionResult:
     result = ExtractionResult(
         doc_id=doc_id,
         company_name=data.get("company_name", ""),
         pitch=data.get("pitch", ""),
-        founders=[Founder(**f) for f in data.get("founders", [])],
+        founders=[Founder(**f) for f in data.get("founders") or []],
         business_model=data.get("business_model", ""),
-        financials=Financials(**data.get("financials", {})),
-        tam=TAM(**data.get("tam", {})),
-        traction=Traction(**data.get("traction", {})),
+        financials=Financials(**(data.get("financials") or {})),
+        tam=TAM(**(data.get("tam") or {})),
+        traction=Traction(**(data.get("traction") or {})),
         competitors=data.get("competitors", []),
-        ask=Ask(**data.get("ask", {})),
+        ask=Ask(**(data.get("ask") or {})),
         risks=data.get("risks", []),
         status="completed",
     )
 
     # Cache result
-    save_json(get_data_path("extractions", doc_id), result.model_dump())
+    extraction_cache.save(get_data_path("extractions", doc_id), result)
     return result
 
 
+async def _extract_group(
+    doc_id: str, group: str, top_k: int, refresh: bool = False, cache: bool = True,
+) -> tuple[dict, str, str]:
+    """Extract one field group from the document's top-k chunks for that group's query.
+
+    Returns (parsed fields, prompt, raw response); the prompt is empty if nothing was retrieved.
+    """
+    query, fields_schema = EXTRACTION_FIELD_GROUPS[group]
+    query_embedding = await get_query_embedding_async(query)
+    chunks = await run_blocking(query_documents, query_embedding, top_k=top_k, doc_ids=[doc_id])
+    if not chunks:
+        return {}, "", ""
+
+    chunks = fit_chunks(chunks, input_budget(EXTRACTION_GROUP_PROMPT, fields_schema=fields_schema))
+    prompt = EXTRACTION_GROUP_PROMPT.format(document_text=build_context(chunks), fields_schema=fields_schema)
+    response = await call_llm_async(
+        prompt, json_mode=True, cache=cache, refresh=refresh, label=f"extraction:{group}"
+    )
+    try:
+        data = json.loads(response)
+    except json.JSONDecodeError:
+        logger.warning(f"[{doc_id}] Could not parse '{group}' extraction as JSON")
+        data = {}
+    return (data if isinstance(data, dict) else {}), prompt, response
+
+
+async def run_targeted_extraction(
+    doc_id: str, top_k: int | None = None, refresh: bool = False, cache: bool = True,
+) -> list[tuple[dict, str, str]]:
+    """Run every field group concurrently against the document's indexed chunks.
+
+    cache=False bypasses the LLM response cache entirely (e.g. for benchmarking).
+    """
+    top_k = top_k or EXTRACTION_TOP_K
+    return await asyncio.gather(
+        *(_extract_group(doc_id, group, top_k, refresh, cache) for group in EXTRACTION_FIELD_GROUPS)
+    )
+
+
+async def extract_document_targeted_async(doc_id: str, pdf_path: str, refresh: bool = False) -> ExtractionResult:
+    """Extract from retrieved chunks, one prompt per field group, instead of the whole document.
+
+    Falls back to full-text extraction if the document has no chunks in the vector store.
+    """
+    groups = await run_targeted_extraction(doc_id, refresh=refresh)
+    if not any(prompt for _, prompt, _ in groups):
+        logger.info(f"[{doc_id}] No indexed chunks; falling back to full-text extraction")
+        return await extract_document_async(doc_id, pdf_path, mode="full", refresh=refresh)
+
+    data = {}
+    for fields, _, _ in groups:
+        data.update(fields)
+    return await run_blocking(save_extraction_data, doc_id, data)
+
+
+async def extract_document_async(
+    doc_id: str, pdf_path: str, mode: str | None = None, refresh: bool = False,
+) -> ExtractionResult:
+    """Extract structured data from a VC memo PDF using GPT-4.
+
+    mode is "full" or "targeted" (see extract_document_targeted_async); defaults to EXTRACTION_MODE.
+    refresh=True ignores a cached LLM response for the same prompt.
+    """
+    if (mode or EXTRACTION_MODE) == "targeted":
+        return await extract_document_targeted_async(doc_id, pdf_path, refresh)
+    prompt = await run_blocking(_build_prompt, pdf_path)
+    if prompt is None:
+        return ExtractionResult(doc_id=doc_id, status="error", error_message="No text extracted from PDF")
+    response = await call_llm_async(prompt, json_mode=True, refresh=refresh, label="extraction")
+    return await run_blocking(_save_result, doc_id, response)
+
+
 def get_cached_extraction(doc_id: str) -> ExtractionResult | None:
     """Get cached extraction result."""
-    data = load_json(get_data_path("extractions", doc_id))
-    if data:
-        return ExtractionResult(**data)
-    return None
+    return extraction_cache.get(get_data_path("extractions", doc_id))
+
+
+def get_cached_extraction_with_json(doc_id: str) -> tuple[ExtractionResult, bytes] | None:
+    """Cached extraction result plus its serialized JSON, ready to splice into a response."""
+    return extraction_cache.load(get_data_path("extractions", doc_id))
+
+
+def delete_extraction(doc_id: str):
+    extraction_cache.delete(get_data_path("extractions", doc_id))
+
+
+def copy_extraction(src_doc_id: str, dst_doc_id: str) -> bool:
+    """Reuse another document's extraction result for an identical file."""
+    data = load_json(get_data_path("extractions", src_doc_id))
+    if not data:
+        return False
+    data["doc_id"] = dst_doc_id
+    extraction_cache.save(get_data_path("extractions", dst_doc_id), ExtractionResult(**data))
+    return True
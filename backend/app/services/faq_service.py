@@ -1,71 +1,91 @@
 import json
 import traceback
 from app.services.llm_service import call_llm
-from app.services.pdf_processor import extract_full_text
+from app.services.extraction_service import document_text_for_prompt
 from app.models.faq import FAQItem, FAQResponse
 from app.utils.prompts import FAQ_PROMPT
-from app.utils.file_utils import save_json, load_json, get_data_path
+from app.utils.file_utils import load_json, get_data_path
+from app.utils.artifact_cache import ArtifactCache
+
+faq_cache: ArtifactCache[FAQResponse] = ArtifactCache(FAQResponse)
 
 
 def set_faq_status(doc_id: str, doc_name: str, status: str):
     """Save a status-only FAQ entry (for generating/error states)."""
     result = FAQResponse(doc_id=doc_id, doc_name=doc_name, faqs=[], status=status)
-    save_json(get_data_path("faqs", doc_id), result.model_dump())
+    faq_cache.save(get_data_path("faqs", doc_id), result)
+
+
+def parse_faqs(data) -> list[FAQItem]:
+    """FAQ items from a parsed GPT response."""
+    # Handle all possible GPT response formats
+    if isinstance(data, list):
+        faqs_raw = data
+    elif isinstance(data, dict):
+        faqs_raw = data.get("faqs", data.get("questions", data.get("items", [])))
+        # If GPT returned a single FAQ object instead of array
+        if not faqs_raw and "question" in data and "answer" in data:
+            faqs_raw = [data]
+    else:
+        faqs_raw = []
+
+    return [FAQItem(question=f.get("question", ""), answer=f.get("answer", "")) for f in faqs_raw if isinstance(f, dict)]
+
+
+def save_faqs(doc_id: str, doc_name: str, faqs: list[FAQItem]) -> FAQResponse:
+    result = FAQResponse(doc_id=doc_id, doc_name=doc_name, faqs=faqs, status="completed")
+    faq_cache.save(get_data_path("faqs", doc_id), result)
+    return result
 
 
-def generate_faqs(doc_id: str, doc_name: str, pdf_path: str) -> FAQResponse:
-    """Generate 20 investor FAQs for a document using GPT-4."""
+def generate_faqs(doc_id: str, doc_name: str, pdf_path: str, refresh: bool = False) -> FAQResponse:
+    """Generate 20 investor FAQs for a document using GPT-4. refresh=True ignores a cached LLM response."""
     try:
-        text = extract_full_text(pdf_path)
-        if not text.strip():
+        text = document_text_for_prompt(pdf_path, FAQ_PROMPT)
+        if text is None:
             result = FAQResponse(doc_id=doc_id, doc_name=doc_name, status="error")
-            save_json(get_data_path("faqs", doc_id), result.model_dump())
+            faq_cache.save(get_data_path("faqs", doc_id), result)
             return result
 
-        if len(text) > 100000:
-            text = text[:100000]
-
         prompt = FAQ_PROMPT.format(document_text=text)
-        response = call_llm(prompt, json_mode=True)
+        response = call_llm(prompt, json_mode=True, refresh=refresh, label="faq")
 
         try:
-            data = json.loads(response)
-            # Handle all possible GPT response formats
-            if isinstance(data, list):
-                faqs_raw = data
-            elif isinstance(data, dict):
-                faqs_raw = data.get("faqs", data.get("questions", data.get("items", [])))
-                # If GPT returned a single FAQ object instead of array
-                if not faqs_raw and "question" in data and "answer" in data:
-                    faqs_raw = [data]
-            else:
-                faqs_raw = []
-
-            faqs = [FAQItem(question=f.get("question", ""), answer=f.get("answer", "")) for f in faqs_raw if isinstance(f, dict)]
+            faqs = parse_faqs(json.loads(response))
         except (json.JSONDecodeError, TypeError) as e:
             print(f"FAQ parse error for {doc_id}: {e}")
             print(f"Raw response: {response[:500]}")
             result = FAQResponse(doc_id=doc_id, doc_name=doc_name, status="error")
-            save_json(get_data_path("faqs", doc_id), result.model_dump())
+            faq_cache.save(get_data_path("faqs", doc_id), result)
             return result
 
-        result = FAQResponse(doc_id=doc_id, doc_name=doc_name, faqs=faqs, status="completed")
-        save_json(get_data_path("faqs", doc_id), result.model_dump())
-        return result
+        return save_faqs(doc_id, doc_name, faqs)
     except Exception as e:
         print(f"FAQ generation failed for {doc_id}: {traceback.format_exc()}")
         result = FAQResponse(doc_id=doc_id, doc_name=doc_name, status="error")
-        save_json(get_data_path("faqs", doc_id), result.model_dump())
+        faq_cache.save(get_data_path("faqs", doc_id), result)
         return result
 
 
 def get_cached_faqs(doc_id: str) -> FAQResponse | None:
     """Get cached FAQ result."""
-    data = load_json(get_data_path("faqs", doc_id))
-    if data:
-        faq = FAQResponse(**data)
-        # Don't return "generating" status as cached — let the route handle that
-        if faq.status == "generating":
-            return None
-        return faq
-    return None
+    faq = faq_cache.get(get_data_path("faqs", doc_id))
+    # Don't return "generating" status as cached — let the route handle that
+    if faq is None or faq.status == "generating":
+        return None
+    return faq
+
+
+def delete_faqs(doc_id: str):
+    faq_cache.delete(get_data_path("faqs", doc_id))
+
+
+def copy_faqs(src_doc_id: str, dst_doc_id: str, doc_name: str) -> bool:
+    """Reuse another document's completed FAQs for an identical file."""
+    data = load_json(get_data_path("faqs", src_doc_id))
+    if not data or data.get("status") != "completed":
+        return False
+    data["doc_id"] = dst_doc_id
+    data["doc_name"] = doc_name
+    faq_cache.save(get_data_path("faqs", dst_doc_id), FAQResponse(**data))
+    return True
@@ -0,0 +1,264 @@
+"""Staged document ingest: parse -> embed -> extract, with bounded queues between stages.
+
+Work comes from the durable job queue in app.db.job_queue. A feeder claims
+jobs under a lease and keeps renewing it while they move through the
+pipeline. Each stage has its own pool of asyncio workers. Parsing runs on
+pdf_processor's process pool, and embedding and extraction await the async
+OpenAI client. While one document is being embedded or extracted, the next
+one can already be parsed, so a batch takes about as long as its slowest
+stage rather than the sum of all three.
+
+Every completed stage is checkpointed on the job. If a job is reclaimed after
+a crash or restart, it skips the stages it already finished. FAQ generation
+jobs go through the same queue and have a worker pool of their own.
+"""
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable
+from app.config import (
+    INGEST_PARSE_WORKERS, INGEST_EMBED_WORKERS, INGEST_EXTRACT_WORKERS, INGEST_FAQ_WORKERS,
+    INGEST_QUEUE_SIZE, INGEST_MAX_IN_FLIGHT, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL,
+)
+from app.db import job_queue
+from app.models.document import PageContent
+from app.services.pdf_processor import get_pages_async
+from app.services.vector_service import add_document_to_store_async, delete_document_from_store
+from app.services.extraction_service import extract_document_async, delete_extraction
+from app.services.analysis_service import analyze_document_async, combined_analysis_enabled
+from app.services.faq_service import generate_faqs, delete_faqs
+from app.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+INGEST = "ingest"
+FAQ = "faq"
+
+# Ingest checkpoints, in order
+TEXT_EXTRACTED = "text_extracted"
+EMBEDDED = "embedded"
+EXTRACTED = "extracted"
+STAGES = [TEXT_EXTRACTED, EMBEDDED, EXTRACTED]
+
+
+@dataclass
+class IngestJob:
+    job_id: int
+    kind: str
+    doc_id: str
+    payload: dict
+    attempts: int
+    stage: str | None = None
+    pages: list[PageContent] = field(default_factory=list)
+
+    def reached(self, stage: str) -> bool:
+        return self.stage is not None and STAGES.index(self.stage) >= STAGES.index(stage)
+
+
+class IngestPipeline:
+    """Drains ingest and FAQ jobs from the job queue.
+
+    get_doc(doc_id) looks up the document record (None once it's deleted),
+    update_doc(doc_id, updates) persists document status and
+    emit_progress(doc_id, step, status, detail, progress) publishes progress events;
+    all are called off the loop.
+    """
+
+    def __init__(
+        self,
+        get_doc: Callable[[str], dict | None],
+        update_doc: Callable[[str, dict], None],
+        emit_progress: Callable[..., None],
+    ):
+        self.get_doc = get_doc
+        self.update_doc = update_doc
+        self.emit_progress = emit_progress
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight: dict[int, IngestJob] = {}
+        self._slots: asyncio.Semaphore | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def start(self):
+        """Start the feeder, lease renewal and stage workers on the running loop."""
+        if self._tasks:
+            return
+        self._slots = asyncio.Semaphore(INGEST_MAX_IN_FLIGHT)
+        self._wakeup = asyncio.Event()
+        self._queues = {
+            "parse": asyncio.Queue(),
+            "embed": asyncio.Queue(maxsize=INGEST_QUEUE_SIZE),
+            "extract": asyncio.Queue(maxsize=INGEST_QUEUE_SIZE),
+            "faq": asyncio.Queue(),
+        }
+        stages = [
+            (self._parse, "parse", "embed", INGEST_PARSE_WORKERS),
+            (self._embed, "embed", "extract", INGEST_EMBED_WORKERS),
+            (self._extract, "extract", None, INGEST_EXTRACT_WORKERS),
+            (self._faq, "faq", None, INGEST_FAQ_WORKERS),
+        ]
+        for stage, inbox, outbox, workers in stages:
+            for _ in range(workers):
+                self._tasks.append(asyncio.create_task(self._worker(stage, inbox, outbox)))
+        self._tasks.append(asyncio.create_task(self._feed()))
+        self._tasks.append(asyncio.create_task(self._renew_leases()))
+        logger.info(f"Ingest pipeline started as worker {self.worker_id}")
+
+    async def submit(self, doc_tasks: list[tuple[str, str, str]], refresh: bool = False):
+        """Queue (doc_id, filepath, filename) tuples for ingest.
+
+        refresh=True makes the AI step ignore cached LLM responses.
+        """
+        for doc_id, filepath, filename in doc_tasks:
+            payload = {"filepath": filepath, "filename": filename, "refresh": refresh}
+            await run_blocking(job_queue.enqueue, INGEST, doc_id, payload)
+        self.notify()
+
+    def notify(self):
+        """Wake the feeder so newly queued work is claimed without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._in_flight:
+            # Requeue unfinished jobs now rather than waiting for their leases to expire
+            await run_blocking(job_queue.release, list(self._in_flight), self.worker_id)
+            self._in_flight.clear()
+
+    async def _feed(self):
+        while True:
+            await self._slots.acquire()
+            row = await run_blocking(job_queue.claim, self.worker_id, [INGEST, FAQ], JOB_LEASE_SECONDS)
+            if row is None:
+                self._slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job = IngestJob(row["id"], row["kind"], row["doc_id"], row["payload"], row["attempts"], row["stage"])
+            self._in_flight[job.job_id] = job
+            await self._queues["faq" if job.kind == FAQ else "parse"].put(job)
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            lost = await run_blocking(job_queue.renew_leases, list(self._in_flight), self.worker_id, JOB_LEASE_SECONDS)
+            for job_id in lost:
+                logger.warning(f"Lost lease on job {job_id}; another worker may pick it up")
+
+    def _finish(self, job: IngestJob):
+        self._in_flight.pop(job.job_id, None)
+        self._slots.release()
+
+    async def _worker(self, stage, inbox: str, outbox: str | None):
+        queue = self._queues[inbox]
+        while True:
+            job = await queue.get()
+            try:
+                # A document deleted mid-job must not be re-populated by the stages still to run
+                done = await self._document_gone(job) or await stage(job)
+                done = await self._document_gone(job) or done
+            except Exception as e:
+                await self._handle_failure(job, e)
+                self._finish(job)
+            else:
+                if done or outbox is None:
+                    await run_blocking(job_queue.complete, job.job_id, self.worker_id)
+                    self._finish(job)
+                else:
+                    await self._queues[outbox].put(job)
+            finally:
+                queue.task_done()
+
+    async def _handle_failure(self, job: IngestJob, error: Exception):
+        logger.exception(f"Error processing document {job.doc_id} (job {job.job_id}): {error}")
+        retrying = await run_blocking(job_queue.fail, job.job_id, self.worker_id, job.attempts, str(error))
+        if job.kind != INGEST:
+            return
+        if retrying:
+            await self._emit(job.doc_id, "retry", "started", f"Retrying after error: {error}", 0)
+        else:
+            await run_blocking(self.update_doc, job.doc_id, {"status": "error", "error_message": str(error)})
+            await self._emit(job.doc_id, "error", "error", str(error), 0)
+
+    async def _document_gone(self, job: IngestJob) -> bool:
+        """True if the job's document was deleted; anything the job already wrote for it is removed."""
+        if await run_blocking(self.get_doc, job.doc_id) is not None:
+            return False
+        logger.info(f"[{job.doc_id}] Document was deleted; dropping job {job.job_id}")
+        await run_blocking(delete_document_from_store, job.doc_id)
+        await run_blocking(delete_extraction, job.doc_id)
+        await run_blocking(delete_faqs, job.doc_id)
+        job.pages = []
+        return True
+
+    async def _emit(self, doc_id: str, step: str, status: str, detail: str = "", progress: int = 0):
+        await run_blocking(self.emit_progress, doc_id, step, status, detail, progress)
+
+    async def _checkpoint(self, job: IngestJob, stage: str):
+        job.stage = stage
+        await run_blocking(job_queue.checkpoint, job.job_id, self.worker_id, stage)
+
+    async def _parse(self, job: IngestJob) -> bool:
+        filename = job.payload["filename"]
+        await run_blocking(self.update_doc, job.doc_id, {"status": "processing"})
+        logger.info(f"[{job.doc_id}] Starting processing: {filename}")
+        await self._emit(job.doc_id, "text_extraction", "started", f"Extracting text from {filename}...", 10)
+        # Served from the page store when the text was already extracted, so resuming is cheap
+        job.pages = await get_pages_async(job.payload["filepath"])
+        logger.info(f"[{job.doc_id}] Text extracted: {len(job.pages)} pages")
+        await self._emit(job.doc_id, "text_extraction", "completed", f"Extracted {len(job.pages)} pages", 25)
+        if not job.reached(TEXT_EXTRACTED):
+            await self._checkpoint(job, TEXT_EXTRACTED)
+        return False
+
+    async def _embed(self, job: IngestJob) -> bool:
+        if not job.reached(EMBEDDED):
+            await self._emit(job.doc_id, "embedding", "started", "Generating embeddings...", 35)
+            # Clear chunks a previous, interrupted attempt may have written
+            await run_blocking(delete_document_from_store, job.doc_id)
+            await add_document_to_store_async(job.doc_id, job.payload["filename"], job.pages)
+            logger.info(f"[{job.doc_id}] Embeddings complete")
+            await self._checkpoint(job, EMBEDDED)
+        await self._emit(job.doc_id, "embedding", "completed", "Indexed in vector database", 60)
+        return False
+
+    async def _extract(self, job: IngestJob) -> bool:
+        if not job.reached(EXTRACTED):
+            await self._emit(job.doc_id, "ai_extraction", "started", "AI analysis in progress...", 65)
+            if combined_analysis_enabled():
+                # Extraction and FAQs from one call, so the FAQ page is ready when processing finishes
+                result = await analyze_document_async(
+                    job.doc_id, job.payload["filename"], job.payload["filepath"], job.payload.get("refresh", False)
+                )
+            else:
+                result = await extract_document_async(
+                    job.doc_id, job.payload["filepath"], refresh=job.payload.get("refresh", False)
+                )
+            if result.status == "error":
+                # Fail the job so retry/backoff applies, rather than marking the document processed
+                raise RuntimeError(f"AI extraction failed: {result.error_message}")
+            logger.info(f"[{job.doc_id}] AI extraction complete")
+            await self._checkpoint(job, EXTRACTED)
+        await self._emit(job.doc_id, "ai_extraction", "completed", "AI extraction complete", 95)
+
+        await run_blocking(self.update_doc, job.doc_id, {"status": "processed", "page_count": len(job.pages)})
+        await self._emit(job.doc_id, "done", "completed", "Done!", 100)
+        logger.info(f"[{job.doc_id}] Processing complete!")
+        job.pages = []
+        return True
+
+    async def _faq(self, job: IngestJob) -> bool:
+        await run_blocking(
+            generate_faqs, job.doc_id, job.payload["doc_name"], job.payload["filepath"], job.payload.get("refresh", False)
+        )
+        return True
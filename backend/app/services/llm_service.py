@@ -1,67 +1,328 @@
-from openai import OpenAI
-from app.config import OPENAI_API_KEY, EMBEDDING_MODEL, LLM_MODEL
+import time
+import asyncio
+import logging
+import httpx
+from openai import OpenAI, AsyncOpenAI, RateLimitError, APIConnectionError, InternalServerError
+from app.config import (
+    OPENAI_API_KEY, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, LLM_MODEL, LLM_MAX_RETRIES, LLM_MAX_TOKENS, LLM_CACHE_ENABLED,
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_KEEPALIVE_EXPIRY,
+    EMBEDDING_BATCH_TOKENS, EMBEDDING_MAX_INPUT_TOKENS, EMBEDDING_CONCURRENCY, EMBEDDING_MAX_RETRIES,
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL,
+)
+from app.db import embedding_cache, llm_cache
+from app.services.rate_limiter import INTERACTIVE, BACKGROUND, RateLimitScheduler, llm_scheduler, embedding_scheduler
+from app.utils.async_utils import run_blocking
+from app.utils.lru_cache import LRUCache
+from app.utils.tokens import MESSAGE_OVERHEAD_TOKENS, get_encoding, count_tokens
+
+logger = logging.getLogger(__name__)
 
 _client = None
+_async_client = None
+
+OPENAI_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+# Retries (including 429s) are handled by the schedulers, not the SDK
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class TruncatedCompletionError(Exception):
+    """The completion stopped at max_tokens, so its content is incomplete."""
+
+query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL)
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
 
 
 def get_openai_client() -> OpenAI:
     global _client
     if _client is None:
-        _client = OpenAI(api_key=OPENAI_API_KEY, timeout=120.0)
+        _client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=OPENAI_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.Client(limits=_pool_limits(), timeout=OPENAI_TIMEOUT),
+        )
     return _client
 
 
-def generate_embeddings(texts: list[str]) -> list[list[float]]:
-    """Generate embeddings for a list of texts using OpenAI."""
-    client = get_openai_client()
-    # Batch in groups of 2048
-    all_embeddings = []
-    for i in range(0, len(texts), 2048):
-        batch = texts[i:i + 2048]
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
+def get_async_openai_client() -> AsyncOpenAI:
+    """Shared async client for the API server's event loop, with a pooled keep-alive connection set."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=OPENAI_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_pool_limits(), timeout=OPENAI_TIMEOUT),
         )
-        all_embeddings.extend([item.embedding for item in response.data])
-    return all_embeddings
+    return _async_client
 
 
-def call_llm(prompt: str, json_mode: bool = False) -> str:
-    """Call GPT-4 Turbo with a prompt."""
-    client = get_openai_client()
+async def close_async_openai_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def _scheduled_call(scheduler: RateLimitScheduler, cost: int, priority: int, request, max_retries: int):
+    """Send a raw-response request once the scheduler admits it, retrying transient failures."""
+    for attempt in range(max_retries + 1):
+        scheduler.acquire(cost, priority)
+        try:
+            raw = request()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = scheduler.backoff(e, attempt)
+            logger.warning(f"OpenAI {scheduler.name} call failed ({e.__class__.__name__}), retry {attempt + 1}/{max_retries}")
+            time.sleep(delay)
+            continue
+        scheduler.observe_headers(raw.headers)
+        return raw.parse()
+
+
+async def _scheduled_call_async(scheduler: RateLimitScheduler, cost: int, priority: int, request, max_retries: int):
+    """Async _scheduled_call; request is a zero-argument coroutine function."""
+    for attempt in range(max_retries + 1):
+        await scheduler.acquire_async(cost, priority)
+        try:
+            raw = await request()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = scheduler.backoff(e, attempt)
+            logger.warning(f"OpenAI {scheduler.name} call failed ({e.__class__.__name__}), retry {attempt + 1}/{max_retries}")
+            await asyncio.sleep(delay)
+            continue
+        scheduler.observe_headers(raw.headers)
+        return raw.parse()
+
+
+def _embedding_kwargs() -> dict:
+    kwargs = {"model": EMBEDDING_MODEL}
+    if EMBEDDING_DIMENSIONS:
+        kwargs["dimensions"] = EMBEDDING_DIMENSIONS
+    return kwargs
+
+
+def _pack_embedding_batches(texts: list[str]) -> list[tuple[list[tuple[int, str]], int]]:
+    """Group (index, text) pairs into requests that fit the per-request token and input caps.
+
+    Returns (batch, token count) pairs. Inputs longer than the model's per-input
+    limit are truncated to it.
+    """
+    enc = get_encoding(EMBEDDING_MODEL)
+    batches = []
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) > EMBEDDING_MAX_INPUT_TOKENS:
+            tokens = tokens[:EMBEDDING_MAX_INPUT_TOKENS]
+            text = enc.decode(tokens)
+        if batch and (batch_tokens + len(tokens) > EMBEDDING_BATCH_TOKENS or len(batch) == 2048):
+            batches.append((batch, batch_tokens))
+            batch, batch_tokens = [], 0
+        batch.append((i, text))
+        batch_tokens += len(tokens)
+    if batch:
+        batches.append((batch, batch_tokens))
+    return batches
+
+
+async def _embed_batch(client: AsyncOpenAI, texts: list[str], tokens: int, priority: int) -> list[list[float]]:
+    response = await _scheduled_call_async(
+        embedding_scheduler, tokens, priority,
+        lambda: client.embeddings.with_raw_response.create(input=texts, **_embedding_kwargs()),
+        EMBEDDING_MAX_RETRIES,
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+async def _dispatch_embeddings(client: AsyncOpenAI, texts: list[str], priority: int = BACKGROUND) -> list[list[float]]:
+    """Embed texts in token-budgeted batches, EMBEDDING_CONCURRENCY requests in flight, in input order.
+
+    Each batch is retried on its own, so one throttled request doesn't restart the others.
+    """
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    results: list[list[float] | None] = [None] * len(texts)
+
+    async def run(batch: list[tuple[int, str]], tokens: int):
+        async with semaphore:
+            vectors = await _embed_batch(client, [t for _, t in batch], tokens, priority)
+        for (i, _), vector in zip(batch, vectors):
+            results[i] = vector
+
+    batches = await run_blocking(_pack_embedding_batches, texts)
+    await asyncio.gather(*(run(b, tokens) for b, tokens in batches))
+    return results
+
+
+def _lookup_cached_embeddings(texts: list[str]) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+    """Returns (hash per text, cached vectors by hash, uncached texts by hash)."""
+    hashes = [embedding_cache.text_hash(t) for t in texts]
+    vectors = embedding_cache.get_many(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, hashes)
+    missing = {h: t for h, t in zip(hashes, texts) if h not in vectors}
+    return hashes, vectors, missing
+
+
+def _store_fresh_embeddings(vectors: dict, missing: dict[str, str], fresh_vectors: list[list[float]]):
+    fresh = dict(zip(missing, fresh_vectors))
+    embedding_cache.put_many(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, fresh)
+    vectors.update(fresh)
+
+
+async def generate_embeddings_async(texts: list[str]) -> list[list[float]]:
+    """Generate embeddings for a list of texts on the shared client, only sending cache misses to OpenAI."""
+    hashes, vectors, missing = await run_blocking(_lookup_cached_embeddings, texts)
+    if missing:
+        fresh_vectors = await _dispatch_embeddings(get_async_openai_client(), list(missing.values()))
+        await run_blocking(_store_fresh_embeddings, vectors, missing, fresh_vectors)
+    logger.info(f"Embeddings: {len(texts) - len(missing)}/{len(texts)} from cache, {len(missing)} requested")
+    return [vectors[h] for h in hashes]
+
+
+def _completion_kwargs(prompt: str, json_mode: bool = False) -> dict:
     kwargs = {
         "model": LLM_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.1,
-        "max_tokens": 4096,
+        "max_tokens": LLM_MAX_TOKENS,
     }
     if json_mode:
         kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
+
+
+def _streaming_kwargs(prompt: str) -> dict:
+    return {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.2,
+        "max_tokens": LLM_MAX_TOKENS,
+        "stream": True,
+    }
+
+
+def _completion_cost(kwargs: dict, label: str) -> int:
+    """Tokens OpenAI charges against TPM at admission: the prompt plus max_tokens.
+
+    The prompt size is logged per label so each endpoint's cost can be tuned.
+    """
+    prompt_tokens = sum(count_tokens(m["content"], kwargs["model"]) + MESSAGE_OVERHEAD_TOKENS for m in kwargs["messages"])
+    logger.info(f"LLM prompt [{label}]: {prompt_tokens} tokens (max_tokens {kwargs['max_tokens']})")
+    return prompt_tokens + kwargs["max_tokens"]
+
 
-    response = client.chat.completions.create(**kwargs)
-    return response.choices[0].message.content
+def _completion_content(response, label: str) -> tuple[str, bool]:
+    """(content, complete) for a completion; incomplete means it was cut off at max_tokens."""
+    choice = response.choices[0]
+    complete = choice.finish_reason != "length"
+    if not complete:
+        logger.warning(f"LLM completion [{label}] hit max_tokens; output is truncated")
+    return choice.message.content, complete
 
 
-def call_llm_streaming(prompt: str):
-    """Call GPT-4 Turbo with streaming."""
+def call_llm(
+    prompt: str, json_mode: bool = False, priority: int = BACKGROUND, cache: bool = True, refresh: bool = False,
+    label: str = "llm",
+) -> str:
+    """Call GPT-4 Turbo with a prompt.
+
+    With LLM_CACHE_ENABLED, identical requests are answered from the response cache.
+    cache=False bypasses it entirely; refresh=True skips the lookup but stores the new response.
+    """
+    kwargs = _completion_kwargs(prompt, json_mode)
+    use_cache = LLM_CACHE_ENABLED and cache
+    key = llm_cache.fingerprint(kwargs) if use_cache else None
+    if use_cache and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
     client = get_openai_client()
-    stream = client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=4096,
-        stream=True,
+    response = _scheduled_call(
+        llm_scheduler, _completion_cost(kwargs, label), priority,
+        lambda: client.chat.completions.with_raw_response.create(**kwargs),
+        LLM_MAX_RETRIES,
+    )
+    content, complete = _completion_content(response, label)
+    if use_cache and complete:
+        llm_cache.put(key, kwargs["model"], content)
+    return content
+
+
+async def call_llm_async(
+    prompt: str, json_mode: bool = False, priority: int = BACKGROUND, cache: bool = True, refresh: bool = False,
+    label: str = "llm", require_complete: bool = False,
+) -> str:
+    """Async call_llm on the shared client.
+
+    require_complete=True raises TruncatedCompletionError instead of returning output cut off at max_tokens.
+    """
+    kwargs = _completion_kwargs(prompt, json_mode)
+    use_cache = LLM_CACHE_ENABLED and cache
+    key = llm_cache.fingerprint(kwargs) if use_cache else None
+    if use_cache and not refresh:
+        cached = await run_blocking(llm_cache.get, key)
+        if cached is not None:
+            return cached
+
+    client = get_async_openai_client()
+    response = await _scheduled_call_async(
+        llm_scheduler, _completion_cost(kwargs, label), priority,
+        lambda: client.chat.completions.with_raw_response.create(**kwargs),
+        LLM_MAX_RETRIES,
     )
-    for chunk in stream:
-        if chunk.choices[0].delta.content:
+    content, complete = _completion_content(response, label)
+    if not complete and require_complete:
+        raise TruncatedCompletionError(f"LLM completion [{label}] was cut off at {kwargs['max_tokens']} tokens")
+    if use_cache and complete:
+        await run_blocking(llm_cache.put, key, kwargs["model"], content)
+    return content
+
+
+async def call_llm_streaming_async(prompt: str, priority: int = INTERACTIVE, label: str = "llm_stream"):
+    """Stream a GPT-4 Turbo answer token by token on the shared client."""
+    client = get_async_openai_client()
+    kwargs = _streaming_kwargs(prompt)
+    stream = await _scheduled_call_async(
+        llm_scheduler, _completion_cost(kwargs, label), priority,
+        lambda: client.chat.completions.with_raw_response.create(**kwargs),
+        LLM_MAX_RETRIES,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
             yield chunk.choices[0].delta.content
 
 
-def generate_single_embedding(text: str) -> list[float]:
-    """Generate embedding for a single text."""
-    client = get_openai_client()
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
+async def generate_single_embedding_async(text: str, priority: int = INTERACTIVE) -> list[float]:
+    """Embedding for a single text, on the shared client."""
+    client = get_async_openai_client()
+    response = await _scheduled_call_async(
+        embedding_scheduler, count_tokens(text, EMBEDDING_MODEL), priority,
+        lambda: client.embeddings.with_raw_response.create(input=text, **_embedding_kwargs()),
+        EMBEDDING_MAX_RETRIES,
     )
     return response.data[0].embedding
+
+
+def _query_cache_key(question: str) -> tuple:
+    return (EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, " ".join(question.split()).casefold())
+
+
+async def get_query_embedding_async(question: str) -> list[float]:
+    """Embedding for a user question, served from the in-process LRU when it was asked recently."""
+    key = _query_cache_key(question)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await generate_single_embedding_async(question)
+        query_embedding_cache.put(key, embedding)
+    return embedding
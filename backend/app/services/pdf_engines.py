@@ -0,0 +1,84 @@
+"""Text-extraction engines that pdf_processor can run a PDF through.
+
+Every engine exposes the same two calls: count the pages of a file, and
+extract the text of a page range [start, end) as (page_number, text) pairs.
+Engines are module-level functions so they can be shipped to pool workers.
+"""
+from typing import Callable, NamedTuple
+import pdfplumber
+
+
+class PdfEngine(NamedTuple):
+    count_pages: Callable[[str], int]
+    extract_range: Callable[[str, int, int], list[tuple[int, str]]]
+
+
+def _pdfplumber_count(pdf_path: str) -> int:
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _pdfplumber_extract(pdf_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    with pdfplumber.open(pdf_path) as pdf:
+        return [(i + 1, pdf.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _pdfminer_count(pdf_path: str) -> int:
+    from pdfminer.pdfpage import PDFPage
+
+    with open(pdf_path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+
+def _pdfminer_extract(pdf_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """Raw pdfminer layout analysis, without pdfplumber's per-character object model."""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+
+    results = []
+    for i, layout in enumerate(extract_pages(pdf_path, page_numbers=range(start, end), laparams=LAParams())):
+        text = "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+        results.append((start + i + 1, text.strip()))
+    return results
+
+
+def _pdfium_count(pdf_path: str) -> int:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _pdfium_extract(pdf_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """PDFium's native text extraction (C++, no layout analysis in Python)."""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    results = []
+    try:
+        for i in range(start, end):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            results.append((i + 1, text.strip()))
+    finally:
+        pdf.close()
+    return results
+
+
+ENGINES: dict[str, PdfEngine] = {
+    "pdfplumber": PdfEngine(_pdfplumber_count, _pdfplumber_extract),
+    "pdfminer": PdfEngine(_pdfminer_count, _pdfminer_extract),
+    "pypdfium2": PdfEngine(_pdfium_count, _pdfium_extract),
+}
+
+
+def get_engine(name: str) -> PdfEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown PDF extraction engine: {name}. Available: {', '.join(ENGINES)}")
+    return ENGINES[name]
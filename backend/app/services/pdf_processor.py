@@ -1,23 +1,191 @@
-import pdfplumber
+import os
+import gzip
+import asyncio
+import json
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.config import PDF_EXTRACT_ENGINE, PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES
 from app.models.document import PageContent
+from app.services.pdf_engines import ENGINES, get_engine
+from app.utils.file_utils import hash_file
+from app.utils.async_utils import run_blocking
 
+logger = logging.getLogger(__name__)
 
-def extract_text_with_pages(pdf_path: str) -> list[PageContent]:
-    """Extract text from PDF page by page."""
-    pages = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text() or ""
-            pages.append(PageContent(page_number=i + 1, text=text))
+PAGE_STORE_DIR = os.path.join("data", "pages")
+
+# (path, size, mtime) -> sha256, so repeat lookups don't re-read the file
+_hash_cache: dict[tuple[str, int, float], str] = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the API process holds threads and open clients
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """Drop a pool broken by a dead worker (OOM, crash in the parser) so the next call gets a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int, engine: str) -> list[tuple[int, str]]:
+    """Extract pages [start, end) in a worker process. Returns (page_number, text) pairs."""
+    return get_engine(engine).extract_range(pdf_path, start, end)
+
+
+def _split_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    step = -(-page_count // parts)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def _pool_ranges(page_count: int, workers: int) -> list[tuple[int, int]]:
+    # A few ranges per worker keeps the pool busy when some pages are much heavier than others
+    return _split_ranges(page_count, min(workers * 4, page_count))
+
+
+def extract_text_with_pages(pdf_path: str, workers: int | None = None, engine: str | None = None) -> list[PageContent]:
+    """Extract text from PDF page by page.
+
+    Uses PDF_EXTRACT_ENGINE unless an engine is given. Documents with at least
+    PDF_PARALLEL_MIN_PAGES pages are split into page ranges and extracted on
+    the shared process pool.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    engine = engine or PDF_EXTRACT_ENGINE
+    pdf_engine = get_engine(engine)
+    page_count = pdf_engine.count_pages(pdf_path)
+
+    if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        return [PageContent(page_number=n, text=text) for n, text in pdf_engine.extract_range(pdf_path, 0, page_count)]
+
+    ranges = _pool_ranges(page_count, workers)
+    for attempt in range(2):
+        pool = get_process_pool()
+        try:
+            futures = [pool.submit(_extract_page_range, pdf_path, start, end, engine) for start, end in ranges]
+            return [PageContent(page_number=n, text=text) for future in futures for n, text in future.result()]
+        except BrokenProcessPool:
+            _discard_process_pool(pool)
+            if attempt:
+                raise
+            logger.warning(f"PDF process pool broke while parsing {pdf_path}; retrying on a new pool")
+
+
+def get_content_hash(pdf_path: str) -> str:
+    """SHA-256 of a file, memoized on its path, size and mtime."""
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime)
+    if key not in _hash_cache:
+        _hash_cache[key] = hash_file(pdf_path)
+    return _hash_cache[key]
+
+
+def set_content_hash(pdf_path: str, content_hash: str):
+    """Record a hash computed elsewhere (e.g. while streaming an upload) so it isn't recomputed."""
+    stat = os.stat(pdf_path)
+    _hash_cache[(os.path.abspath(pdf_path), stat.st_size, stat.st_mtime)] = content_hash
+
+
+def _page_store_path(content_hash: str, engine: str) -> str:
+    return os.path.join(PAGE_STORE_DIR, f"{content_hash}_{engine}.json.gz")
+
+
+def load_stored_pages(content_hash: str, engine: str | None = None) -> list[PageContent] | None:
+    """Load previously extracted pages from the page store."""
+    path = _page_store_path(content_hash, engine or PDF_EXTRACT_ENGINE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return [PageContent(**p) for p in data]
+
+
+def save_stored_pages(content_hash: str, pages: list[PageContent], engine: str | None = None):
+    """Write extracted pages to the page store (gzip-compressed JSON)."""
+    os.makedirs(PAGE_STORE_DIR, exist_ok=True)
+    path = _page_store_path(content_hash, engine or PDF_EXTRACT_ENGINE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump([p.model_dump() for p in pages], f)
+    os.replace(tmp_path, path)
+
+
+def delete_stored_pages(content_hash: str):
+    """Remove stored pages for a file, for every engine."""
+    for engine in ENGINES:
+        path = _page_store_path(content_hash, engine)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_pages(pdf_path: str, content_hash: str | None = None, engine: str | None = None) -> list[PageContent]:
+    """Get page text for a PDF, parsing it only if its content isn't already in the page store."""
+    content_hash = content_hash or get_content_hash(pdf_path)
+    engine = engine or PDF_EXTRACT_ENGINE
+    pages = load_stored_pages(content_hash, engine)
+    if pages is None:
+        pages = extract_text_with_pages(pdf_path, engine=engine)
+        save_stored_pages(content_hash, pages, engine)
     return pages
 
 
 def extract_full_text(pdf_path: str) -> str:
     """Extract all text from PDF as a single string."""
-    pages = extract_text_with_pages(pdf_path)
+    pages = get_pages(pdf_path)
     return "\n\n".join(p.text for p in pages if p.text.strip())
 
 
 def get_page_count(pdf_path: str) -> int:
-    with pdfplumber.open(pdf_path) as pdf:
-        return len(pdf.pages)
+    return len(get_pages(pdf_path))
+
+
+async def get_pages_async(pdf_path: str, content_hash: str | None = None, engine: str | None = None) -> list[PageContent]:
+    """get_pages for event-loop callers. Parsing always runs on the process pool, never in this process."""
+    engine = engine or PDF_EXTRACT_ENGINE
+    content_hash = content_hash or await run_blocking(get_content_hash, pdf_path)
+    pages = await run_blocking(load_stored_pages, content_hash, engine)
+    if pages is not None:
+        return pages
+
+    page_count = await run_blocking(get_engine(engine).count_pages, pdf_path)
+    if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_EXTRACT_WORKERS > 1:
+        ranges = _pool_ranges(page_count, PDF_EXTRACT_WORKERS)
+    else:
+        ranges = [(0, page_count)] if page_count else []
+
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_process_pool()
+        try:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _extract_page_range, pdf_path, start, end, engine) for start, end in ranges
+            ))
+            break
+        except BrokenProcessPool:
+            _discard_process_pool(pool)
+            if attempt:
+                raise
+            logger.warning(f"PDF process pool broke while parsing {pdf_path}; retrying on a new pool")
+    pages = [PageContent(page_number=n, text=text) for part in results for n, text in part]
+    await run_blocking(save_stored_pages, content_hash, pages, engine)
+    return pages
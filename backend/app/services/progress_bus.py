@@ -0,0 +1,126 @@
+"""Push-based progress streaming for SSE clients.
+
+Progress events are stored in the job database (see job_queue.record_progress),
+which gives every event a global, monotonically increasing id that clients
+can resume from with Last-Event-ID. In the API process, one poller task
+tails that table and fans new events out to per-subscriber bounded queues.
+The poller only runs while someone is subscribed. Events emitted in this
+process wake it immediately, and events written by standalone workers are
+picked up within PROGRESS_POLL_INTERVAL.
+
+A subscriber whose queue fills up is disconnected rather than slowing
+everyone else down. Its client reconnects with Last-Event-ID and replays
+from the database.
+"""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from app.config import PROGRESS_POLL_INTERVAL, PROGRESS_SUBSCRIBER_QUEUE, PROGRESS_STREAM_IDLE_TIMEOUT
+from app.db import job_queue
+from app.utils.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+_PRUNE_INTERVAL = 60.0
+_REPLAY_BATCH = 500
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    doc_id: str | None
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=PROGRESS_SUBSCRIBER_QUEUE))
+    overflowed: bool = False
+
+
+class ProgressBus:
+    def __init__(self):
+        self._subscribers: set[_Subscriber] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def notify(self):
+        """Wake the poller now. Safe to call from any thread."""
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _ensure_poller(self):
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        last_id = await run_blocking(job_queue.last_progress_id)
+        last_prune = time.monotonic()
+        while self._subscribers:
+            self._wakeup.clear()
+            events = await run_blocking(job_queue.progress_since, last_id)
+            for last_id, event in events:
+                self._publish(last_id, event)
+            if time.monotonic() - last_prune > _PRUNE_INTERVAL:
+                await run_blocking(job_queue.prune_progress)
+                last_prune = time.monotonic()
+            if not events:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=PROGRESS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        self._task = None
+
+    def _publish(self, event_id: int, event: dict):
+        for sub in list(self._subscribers):
+            if sub.doc_id is not None and sub.doc_id != event["doc_id"]:
+                continue
+            try:
+                sub.queue.put_nowait((event_id, event))
+            except asyncio.QueueFull:
+                logger.warning(f"Progress subscriber fell behind at event {event_id}; disconnecting it")
+                sub.overflowed = True
+                self._subscribers.discard(sub)
+
+    async def subscribe(self, doc_id: str | None = None, last_event_id: int = 0) -> AsyncIterator[tuple[int, dict]]:
+        """Yield (event_id, event) for retained events after last_event_id, then live ones.
+
+        Stops after PROGRESS_STREAM_IDLE_TIMEOUT seconds without events, or if the
+        subscriber falls too far behind.
+        """
+        sub = _Subscriber(doc_id)
+        # Register before replaying, so nothing published during the replay is missed
+        self._subscribers.add(sub)
+        self._ensure_poller()
+        sent = last_event_id
+        try:
+            while True:
+                replay = await run_blocking(job_queue.progress_since, sent, doc_id, _REPLAY_BATCH)
+                for sent, event in replay:
+                    yield sent, event
+                if len(replay) < _REPLAY_BATCH:
+                    break
+            while not sub.overflowed:
+                try:
+                    event_id, event = await asyncio.wait_for(sub.queue.get(), timeout=PROGRESS_STREAM_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if event_id > sent:
+                    sent = event_id
+                    yield event_id, event
+        finally:
+            self._subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "poller_running": self._task is not None and not self._task.done(),
+        }
+
+
+progress_bus = ProgressBus()
+
+
+def emit_progress(doc_id: str, step: str, status: str, detail: str = "", progress: int = 0):
+    """Record a progress event and wake this process's subscribers."""
+    job_queue.record_progress(doc_id, step, status, detail, progress)
+    progress_bus.notify()
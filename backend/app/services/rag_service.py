@@ -1,80 +1,107 @@
-from app.services.llm_service import generate_single_embedding, call_llm, call_llm_streaming
+import logging
+from app.services.llm_service import (
+    get_query_embedding_async, call_llm_async, call_llm_streaming_async,
+)
+from app.services.rate_limiter import INTERACTIVE
 from app.services.vector_service import query_documents
 from app.utils.prompts import RAG_PROMPT
 from app.models.qa import QAResponse, ProvenanceSource
 from app.db.chroma_client import get_collection
+from app.utils.async_utils import run_blocking
+from app.utils.tokens import count_tokens, truncate_to_tokens, input_budget
+from app.config import LLM_MODEL, RAG_CONTEXT_TOKENS
 
+logger = logging.getLogger(__name__)
 
-def build_context(chunks: list[dict]) -> str:
-    """Build context string from retrieved chunks."""
-    context_parts = []
-    for chunk in chunks:
-        context_parts.append(
-            f"[Document: {chunk['doc_name']}, Page {chunk['page_number']}]\n{chunk['text']}"
-        )
-    return "\n---\n".join(context_parts)
+_CONTEXT_SEPARATOR = "\n---\n"
 
 
-def answer_question(question: str, doc_ids: list[str] | None = None) -> QAResponse:
-    """Answer a question using RAG over uploaded documents."""
-    query_embedding = generate_single_embedding(question)
-    chunks = query_documents(query_embedding, top_k=7, doc_ids=doc_ids)
+def _chunk_header(chunk: dict) -> str:
+    return f"[Document: {chunk['doc_name']}, Page {chunk['page_number']}]\n"
+
+
+def build_context(chunks: list[dict]) -> str:
+    """Build context string from retrieved chunks."""
+    return _CONTEXT_SEPARATOR.join(_chunk_header(chunk) + chunk["text"] for chunk in chunks)
 
-    if not chunks:
-        return QAResponse(
-            question=question,
-            answer="No relevant documents found. Please upload documents first.",
-            sources=[],
-        )
 
-    context = build_context(chunks)
-    prompt = RAG_PROMPT.format(context_chunks=context, user_question=question)
-    answer = call_llm(prompt)
+def fit_chunks(chunks: list[dict], budget: int) -> list[dict]:
+    """The leading chunks (in retrieval order) whose context fits in budget tokens.
 
+    If even the first chunk is too large it is truncated rather than dropped.
+    """
+    separator_tokens = count_tokens(_CONTEXT_SEPARATOR, LLM_MODEL)
+    kept, used = [], 0
+    for chunk in chunks:
+        cost = count_tokens(_chunk_header(chunk) + chunk["text"], LLM_MODEL) + (separator_tokens if kept else 0)
+        if used + cost > budget:
+            if not kept:
+                room = budget - count_tokens(_chunk_header(chunk), LLM_MODEL)
+                kept.append({**chunk, "text": truncate_to_tokens(chunk["text"], room)})
+            logger.info(f"Context budget {budget} tokens: kept {len(kept)}/{len(chunks)} chunks")
+            break
+        kept.append(chunk)
+        used += cost
+    return kept
+
+
+def _question_context(chunks: list[dict], question: str) -> tuple[list[dict], str]:
+    """Chunks trimmed to the Q&A context budget, and the prompt built from them."""
+    budget = min(RAG_CONTEXT_TOKENS, input_budget(RAG_PROMPT, user_question=question))
+    chunks = fit_chunks(chunks, budget)
+    return chunks, RAG_PROMPT.format(context_chunks=build_context(chunks), user_question=question)
+
+
+def _unique_sources(chunks: list[dict]) -> list[dict]:
+    """One source per (document, page), in retrieval order."""
     sources = []
     seen = set()
     for chunk in chunks:
         key = f"{chunk['doc_name']}_{chunk['page_number']}"
         if key not in seen:
             seen.add(key)
-            sources.append(ProvenanceSource(
-                doc_name=chunk["doc_name"],
-                page=chunk["page_number"],
-                snippet=chunk["text"][:150] + "...",
-            ))
+            sources.append({
+                "doc_name": chunk["doc_name"],
+                "page": chunk["page_number"],
+                "snippet": chunk["text"][:150] + "...",
+            })
+    return sources
+
+
+NO_DOCUMENTS_ANSWER = "No relevant documents found. Please upload documents first."
+
 
+async def answer_question_async(question: str, doc_ids: list[str] | None = None) -> QAResponse:
+    """Answer a question using RAG over uploaded documents."""
+    query_embedding = await get_query_embedding_async(question)
+    chunks = await run_blocking(query_documents, query_embedding, top_k=7, doc_ids=doc_ids)
+
+    if not chunks:
+        return QAResponse(question=question, answer=NO_DOCUMENTS_ANSWER, sources=[])
+
+    chunks, prompt = _question_context(chunks, question)
+    answer = await call_llm_async(prompt, priority=INTERACTIVE, label="qa")
+
+    sources = [ProvenanceSource(**s) for s in _unique_sources(chunks)]
     return QAResponse(question=question, answer=answer, sources=sources)
 
 
-def answer_question_streaming(question: str, doc_ids: list[str] | None = None):
-    """Stream answer using RAG over uploaded documents."""
-    query_embedding = generate_single_embedding(question)
-    chunks = query_documents(query_embedding, top_k=7, doc_ids=doc_ids)
+async def answer_question_streaming_async(question: str, doc_ids: list[str] | None = None):
+    """Stream an answer using RAG over uploaded documents."""
+    query_embedding = await get_query_embedding_async(question)
+    chunks = await run_blocking(query_documents, query_embedding, top_k=7, doc_ids=doc_ids)
 
     if not chunks:
-        yield {"type": "answer", "data": "No relevant documents found. Please upload documents first."}
+        yield {"type": "answer", "data": NO_DOCUMENTS_ANSWER}
         yield {"type": "done", "data": ""}
         return
 
-    context = build_context(chunks)
-    prompt = RAG_PROMPT.format(context_chunks=context, user_question=question)
+    chunks, prompt = _question_context(chunks, question)
 
-    for token in call_llm_streaming(prompt):
+    async for token in call_llm_streaming_async(prompt, label="qa_stream"):
         yield {"type": "answer", "data": token}
 
-    sources = []
-    seen = set()
-    for chunk in chunks:
-        key = f"{chunk['doc_name']}_{chunk['page_number']}"
-        if key not in seen:
-            seen.add(key)
-            sources.append({
-                "doc_name": chunk["doc_name"],
-                "page": chunk["page_number"],
-                "snippet": chunk["text"][:150] + "...",
-            })
-
-    yield {"type": "sources", "data": sources}
+    yield {"type": "sources", "data": _unique_sources(chunks)}
     yield {"type": "done", "data": ""}
 
 
@@ -0,0 +1,165 @@
+"""Client-side admission control for OpenAI calls.
+
+Each API family (chat completions, embeddings) has a scheduler with two token
+buckets, requests/min and tokens/min. A call estimates its token cost up
+front and waits until both buckets can cover it. Interactive callers (Q&A)
+are admitted ahead of background ones (ingest, FAQ generation). Buckets are
+pulled down to the x-ratelimit-remaining-* headers OpenAI returns, and a 429
+pauses admission for the family until its retry-after has passed.
+
+Buckets are per process. When several API or worker processes share one
+OpenAI account, set RATE_LIMIT_PROCESSES so each takes its share of the limits.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from openai import RateLimitError
+from app.config import LLM_RPM, LLM_TPM, EMBEDDING_RPM, EMBEDDING_TPM, RATE_LIMIT_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Longest single sleep while waiting for admission, so lanes are re-checked often
+_MAX_POLL_SECONDS = 0.25
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until the bucket holds amount (capped at capacity, so oversized calls still run)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def clamp(self, remaining: float, now: float):
+        """Align with the server's view: never more than `remaining` left."""
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class RateLimitScheduler:
+    def __init__(self, name: str, rpm: int, tpm: int, processes: int = 1):
+        self.name = name
+        self.processes = max(1, processes)
+        self.requests = TokenBucket(rpm / self.processes)
+        self.tokens = TokenBucket(tpm / self.processes)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._waiting = [0, 0]
+        self._stats = {"admitted": [0, 0], "waited_seconds": [0.0, 0.0], "rate_limited": 0}
+
+    def _try_admit(self, cost: int, priority: int) -> float:
+        """Admit the call and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if priority == BACKGROUND and self._waiting[INTERACTIVE]:
+                return _MAX_POLL_SECONDS
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(cost)
+            self._stats["admitted"][priority] += 1
+            return 0.0
+
+    def _enter(self, priority: int):
+        with self._lock:
+            self._waiting[priority] += 1
+
+    def _leave(self, priority: int, waited: float):
+        with self._lock:
+            self._waiting[priority] -= 1
+            self._stats["waited_seconds"][priority] += waited
+
+    def acquire(self, cost: int, priority: int = BACKGROUND):
+        """Block until a call costing `cost` tokens may be sent."""
+        start = time.monotonic()
+        self._enter(priority)
+        try:
+            while (wait := self._try_admit(cost, priority)) > 0:
+                time.sleep(min(wait, _MAX_POLL_SECONDS))
+        finally:
+            self._leave(priority, time.monotonic() - start)
+
+    async def acquire_async(self, cost: int, priority: int = BACKGROUND):
+        start = time.monotonic()
+        self._enter(priority)
+        try:
+            while (wait := self._try_admit(cost, priority)) > 0:
+                await asyncio.sleep(min(wait, _MAX_POLL_SECONDS))
+        finally:
+            self._leave(priority, time.monotonic() - start)
+
+    def observe_headers(self, headers):
+        """Pull the buckets down to what OpenAI reports as remaining."""
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        with self._lock:
+            now = time.monotonic()
+            if remaining_requests is not None:
+                self.requests.clamp(float(remaining_requests) / self.processes, now)
+            if remaining_tokens is not None:
+                self.tokens.clamp(float(remaining_tokens) / self.processes, now)
+
+    def backoff(self, error: Exception, attempt: int) -> float:
+        """Seconds the caller should sleep before retrying after `error`.
+
+        A 429 pauses admission for everyone until its retry-after has passed, so
+        the caller doesn't sleep itself; acquire() does the waiting.
+        """
+        delay = min(2 ** attempt, 30) + random.random()
+        if not isinstance(error, RateLimitError):
+            return delay
+        headers = error.response.headers if error.response is not None else {}
+        if headers.get("retry-after-ms"):
+            delay = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            try:
+                delay = float(headers["retry-after"])
+            except ValueError:
+                pass
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._stats["rate_limited"] += 1
+        logger.warning(f"OpenAI {self.name} rate limited; pausing admission for {delay:.1f}s")
+        return 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "requests_available": int(self.requests.level),
+                "tokens_available": int(self.tokens.level),
+                "waiting": {"interactive": self._waiting[INTERACTIVE], "background": self._waiting[BACKGROUND]},
+                "admitted": {"interactive": self._stats["admitted"][INTERACTIVE], "background": self._stats["admitted"][BACKGROUND]},
+                "waited_seconds": {
+                    "interactive": round(self._stats["waited_seconds"][INTERACTIVE], 2),
+                    "background": round(self._stats["waited_seconds"][BACKGROUND], 2),
+                },
+                "rate_limited": self._stats["rate_limited"],
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+llm_scheduler = RateLimitScheduler("chat", LLM_RPM, LLM_TPM, RATE_LIMIT_PROCESSES)
+embedding_scheduler = RateLimitScheduler("embeddings", EMBEDDING_RPM, EMBEDDING_TPM, RATE_LIMIT_PROCESSES)
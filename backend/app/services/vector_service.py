@@ -1,20 +1,28 @@
+from itertools import islice
 from app.db.chroma_client import get_collection
-from app.services.llm_service import generate_embeddings
-from app.utils.chunking import chunk_pages
+from app.services.llm_service import generate_embeddings_async
+from app.utils.chunking import iter_token_chunks
 from app.models.document import PageContent
+from app.utils.async_utils import run_blocking
 
+# Chunks embedded and written to ChromaDB per round, as the chunker produces them
+EMBED_STREAM_BATCH = 2048
 
-def add_document_to_store(doc_id: str, doc_name: str, pages: list[PageContent]):
-    """Chunk document pages, generate embeddings, and store in ChromaDB."""
-    page_dicts = [{"page_number": p.page_number, "text": p.text} for p in pages]
-    chunks = chunk_pages(page_dicts)
 
-    if not chunks:
-        return
+async def add_document_to_store_async(doc_id: str, doc_name: str, pages: list[PageContent]):
+    """Chunk document pages, generate embeddings, and store in ChromaDB.
+
+    Chunking and ChromaDB writes run off the event loop.
+    """
+    page_dicts = ({"page_number": p.page_number, "text": p.text} for p in pages)
+    chunk_iter = iter_token_chunks(page_dicts)
+    while chunks := await run_blocking(lambda: list(islice(chunk_iter, EMBED_STREAM_BATCH))):
+        embeddings = await generate_embeddings_async([c["text"] for c in chunks])
+        await run_blocking(_write_chunks, doc_id, doc_name, chunks, embeddings)
 
-    texts = [c["text"] for c in chunks]
-    embeddings = generate_embeddings(texts)
 
+def _write_chunks(doc_id: str, doc_name: str, chunks: list[dict], embeddings: list[list[float]]):
+    texts = [c["text"] for c in chunks]
     collection = get_collection()
     ids = [f"{doc_id}_chunk_{c['index']}" for c in chunks]
     metadatas = [
@@ -70,3 +78,20 @@ def delete_document_from_store(doc_id: str):
     results = collection.get(where={"doc_id": doc_id})
     if results and results["ids"]:
         collection.delete(ids=results["ids"])
+
+
+def copy_document_in_store(src_doc_id: str, dst_doc_id: str, doc_name: str) -> int:
+    """Duplicate a document's chunks under a new doc_id, reusing the stored embeddings."""
+    collection = get_collection()
+    results = collection.get(where={"doc_id": src_doc_id}, include=["embeddings", "documents", "metadatas"])
+    if not results or not results["ids"]:
+        return 0
+
+    metadatas = [{**m, "doc_id": dst_doc_id, "doc_name": doc_name} for m in results["metadatas"]]
+    collection.add(
+        ids=[f"{dst_doc_id}_chunk_{m['chunk_index']}" for m in metadatas],
+        embeddings=results["embeddings"],
+        documents=results["documents"],
+        metadatas=metadatas,
+    )
+    return len(metadatas)
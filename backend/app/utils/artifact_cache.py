@@ -0,0 +1,87 @@
+import os
+import threading
+from typing import Generic, TypeVar
+from pydantic import BaseModel
+from app.utils.file_utils import save_json, load_json
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ArtifactCache(Generic[M]):
+    """Parsed pydantic models backed by JSON files, reused until the file changes.
+
+    Entries are keyed by path and checked against the file's mtime and size on
+    every lookup, so writes from other processes are picked up. Writes through
+    save() refresh the entry directly. Each entry also keeps the model's
+    serialized JSON so list endpoints can concatenate it without re-encoding.
+    Cached models are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, model: type[M]):
+        self.model = model
+        self._entries: dict[str, tuple[tuple[int, int], M, bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str) -> tuple[M, bytes] | None:
+        """(model, serialized JSON) for the file, or None if it doesn't exist."""
+        signature = _signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if signature is None:
+                self._entries.pop(path, None)
+                return None
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        data = load_json(path)
+        if not data:
+            return None
+        obj = self.model(**data)
+        raw = obj.model_dump_json().encode()
+        with self._lock:
+            self._entries[path] = (signature, obj, raw)
+        return obj, raw
+
+    def get(self, path: str) -> M | None:
+        entry = self.load(path)
+        return entry[0] if entry else None
+
+    def save(self, path: str, obj: M):
+        save_json(path, obj.model_dump())
+        signature = _signature(path)
+        with self._lock:
+            self._entries[path] = (signature, obj, obj.model_dump_json().encode())
+
+    def delete(self, path: str):
+        """Remove the file and its cached entry."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self.invalidate(path)
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
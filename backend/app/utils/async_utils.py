@@ -0,0 +1,99 @@
+import sys
+import time
+import asyncio
+import logging
+import functools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from app.config import BLOCKING_IO_WORKERS, LOOP_STALL_DEBUG, LOOP_STALL_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor = None
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking call (file I/O, ChromaDB, pdf parsing) on the bounded executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_blocking_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+class LoopStallMonitor:
+    """Logs the event loop thread's stack whenever the loop goes LOOP_STALL_THRESHOLD_MS without running.
+
+    A heartbeat task stamps the time on every loop iteration it gets; a watchdog
+    thread compares that stamp to the clock and, when it falls behind, grabs the
+    loop thread's current frame so the log shows what is blocking.
+    """
+
+    def __init__(self, threshold_ms: float = LOOP_STALL_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = self.threshold / 4
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._task = None
+
+    async def _heartbeat(self):
+        while not self._stop.is_set():
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            logger.warning(f"Event loop stalled for {stalled * 1000:.0f}ms; loop thread stack:\n{stack}")
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-stall-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+
+_monitor = None
+
+
+def start_loop_stall_monitor():
+    """Start the stall monitor on the running loop if LOOP_STALL_DEBUG is enabled."""
+    global _monitor
+    if LOOP_STALL_DEBUG and _monitor is None:
+        _monitor = LoopStallMonitor()
+        _monitor.start()
+        logger.info(f"Event loop stall monitor enabled (threshold {LOOP_STALL_THRESHOLD_MS}ms)")
+
+
+def stop_loop_stall_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
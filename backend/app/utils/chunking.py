@@ -1,4 +1,11 @@
-from app.config import CHUNK_SIZE, CHUNK_OVERLAP
+import re
+from collections import deque
+from typing import Iterable, Iterator
+from app.config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL
+from app.utils.tokens import get_encoding
+
+# A sentence runs up to terminal punctuation followed by whitespace, or to the end of the line
+_SENTENCE_RE = re.compile(r"[^\n]+?(?:[.!?]+(?=\s)|(?=\n)|$)")
 
 
 def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[dict]:
@@ -83,3 +90,57 @@ def chunk_pages(pages: list[dict], chunk_size: int = CHUNK_SIZE, overlap: int =
         })
 
     return chunks
+
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group().strip()
+        if sentence:
+            yield sentence
+
+
+def iter_token_chunks(
+    pages: Iterable[dict],
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: str = EMBEDDING_MODEL,
+) -> Iterator[dict]:
+    """Chunk pages in a single pass, sizing chunks and overlap in tokens of the embedding model.
+
+    Chunks are built from whole sentences (sentences longer than chunk_tokens are
+    split on token boundaries) and the overlap is the longest tail of sentences
+    that fits in overlap_tokens. Yields the same dicts as chunk_pages.
+    """
+    enc = get_encoding(model)
+    window: deque[tuple[str, int]] = deque()
+    window_tokens = 0
+    window_page = 1
+    new_in_window = False
+    index = 0
+
+    for page in pages:
+        page_num = page["page_number"]
+        for sentence in _iter_sentences(page["text"]):
+            tokens = enc.encode(" " + sentence, disallowed_special=())
+            if len(tokens) > chunk_tokens:
+                pieces = [enc.decode(tokens[i:i + chunk_tokens]).strip() for i in range(0, len(tokens), chunk_tokens)]
+                parts = [(p, min(chunk_tokens, len(tokens) - i * chunk_tokens)) for i, p in enumerate(pieces)]
+            else:
+                parts = [(sentence, len(tokens))]
+
+            for text, n_tokens in parts:
+                if window_tokens + n_tokens > chunk_tokens and new_in_window:
+                    yield {"text": " ".join(t for t, _ in window), "page_number": window_page, "index": index}
+                    index += 1
+                    while window and (window_tokens + n_tokens > chunk_tokens or window_tokens > overlap_tokens):
+                        _, dropped = window.popleft()
+                        window_tokens -= dropped
+                    new_in_window = False
+                if not new_in_window:
+                    window_page = page_num
+                    new_in_window = True
+                window.append((text, n_tokens))
+                window_tokens += n_tokens
+
+    if new_in_window:
+        yield {"text": " ".join(t for t, _ in window), "page_number": window_page, "index": index}
@@ -1,8 +1,20 @@
 import os
 import uuid
 import json
+import hashlib
+import threading
+from contextlib import contextmanager
 from app.config import UPLOAD_DIR
 
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads in this process
+    fcntl = None
+
+_path_locks: dict[str, threading.RLock] = {}
+_path_locks_guard = threading.Lock()
+_lock_depth: dict[str, int] = {}
+
 
 def ensure_dirs():
     """Ensure required directories exist."""
@@ -15,14 +27,56 @@ def generate_doc_id() -> str:
     return str(uuid.uuid4())[:8]
 
 
+def hash_file(filepath: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def get_upload_path(doc_id: str, filename: str) -> str:
     return os.path.join(UPLOAD_DIR, f"{doc_id}_{filename}")
 
 
 def save_json(filepath: str, data: dict):
+    """Write JSON atomically, so readers in other processes never see a half-written file."""
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, "w") as f:
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp_path, filepath)
+
+
+@contextmanager
+def file_lock(filepath: str):
+    """Exclusive lock on filepath across threads and processes (flock on filepath + ".lock").
+
+    Re-entrant within a thread. Hold it around read-modify-write of shared JSON files.
+    """
+    key = os.path.abspath(filepath)
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(key, threading.RLock())
+    with lock:
+        if _lock_depth.get(key):
+            _lock_depth[key] += 1
+            try:
+                yield
+            finally:
+                _lock_depth[key] -= 1
+            return
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        with open(f"{key}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _lock_depth[key] = 1
+            try:
+                yield
+            finally:
+                _lock_depth[key] = 0
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 def load_json(filepath: str) -> dict | None:
@@ -90,3 +90,154 @@ Return a JSON object with a "faqs" key containing an array of 20 items:
 }}
 
 Return ONLY valid JSON with exactly 20 FAQ items in the "faqs" array."""
+
+
+EXTRACTION_GROUP_PROMPT = """You are an expert venture capital analyst. Extract structured information from the following excerpts of an investment memo.
+
+Excerpts:
+{document_text}
+
+Extract the following information in valid JSON format:
+
+{fields_schema}
+
+Return ONLY valid JSON. If information is not found in the excerpts, use null or empty strings/arrays."""
+
+
+# Field groups for retrieval-targeted extraction: (retrieval query, JSON schema of the fields)
+EXTRACTION_FIELD_GROUPS = {
+    "overview": (
+        "company overview, product, value proposition, business model, revenue streams, competitors",
+        """{
+  "company_name": "string",
+  "pitch": "one-line value proposition",
+  "business_model": "description of revenue streams",
+  "competitors": ["list of competitors"]
+}""",
+    ),
+    "founders": (
+        "founders, founding team, CEO, CTO, management backgrounds and prior experience",
+        """{
+  "founders": [
+    {"name": "string", "role": "string", "background": "string"}
+  ]
+}""",
+    ),
+    "financials": (
+        "financials: revenue, ARR, monthly burn rate, runway, valuation",
+        """{
+  "financials": {
+    "revenue": "current revenue (e.g., $2M ARR)",
+    "burn_rate": "monthly burn (e.g., $500K/month)",
+    "runway": "months of runway",
+    "valuation": "pre-money valuation"
+  }
+}""",
+    ),
+    "tam": (
+        "market size: total addressable market (TAM), serviceable addressable market (SAM)",
+        """{
+  "tam": {
+    "total_addressable_market": "TAM size",
+    "serviceable_market": "SAM size"
+  }
+}""",
+    ),
+    "traction": (
+        "traction: key metrics, customers, growth rate, milestones achieved",
+        """{
+  "traction": {
+    "metrics": ["list of key metrics"],
+    "growth_rate": "e.g., 30% MoM",
+    "milestones": ["key achievements"]
+  }
+}""",
+    ),
+    "ask": (
+        "funding ask: amount being raised, round, use of funds",
+        """{
+  "ask": {
+    "amount": "funding amount requested",
+    "use_of_funds": ["list of planned uses"]
+  }
+}""",
+    ),
+    "risks": (
+        "key risks, challenges, threats, concerns",
+        """{
+  "risks": ["list of key risks"]
+}""",
+    ),
+}
+
+
+ANALYSIS_PROMPT = """You are an expert venture capital analyst. Analyze the following investment memo in two parts: extract structured information, then answer 20 standard investor questions.
+
+Document Text:
+{document_text}
+
+Part 1 ("extraction"): extract the following fields. If information is not found, use null or empty strings/arrays.
+
+Part 2 ("faqs"): answer each question concisely (2-3 sentences) using information from the memo. If information is not available, state "Information not provided in the memo."
+
+Questions:
+1. What problem is the company solving?
+2. What is the unique value proposition?
+3. Who are the target customers?
+4. What is the business model?
+5. What is the current traction?
+6. Who are the founders and their backgrounds?
+7. What is the competitive landscape?
+8. What is the TAM/SAM?
+9. What are the key risks?
+10. What is the funding ask and use of funds?
+11. What is the valuation and cap table structure?
+12. What are the unit economics?
+13. What is the go-to-market strategy?
+14. What milestones have been achieved?
+15. What is the product roadmap?
+16. What regulatory considerations exist?
+17. What is the exit strategy?
+18. What defensibility/moats does the company have?
+19. What partnerships exist?
+20. What are the next 12-month goals?
+
+Return a JSON object in exactly this shape:
+
+{{
+  "extraction": {{
+    "company_name": "string",
+    "pitch": "one-line value proposition",
+    "founders": [
+      {{"name": "string", "role": "string", "background": "string"}}
+    ],
+    "business_model": "description of revenue streams",
+    "financials": {{
+      "revenue": "current revenue (e.g., $2M ARR)",
+      "burn_rate": "monthly burn (e.g., $500K/month)",
+      "runway": "months of runway",
+      "valuation": "pre-money valuation"
+    }},
+    "tam": {{
+      "total_addressable_market": "TAM size",
+      "serviceable_market": "SAM size"
+    }},
+    "traction": {{
+      "metrics": ["list of key metrics"],
+      "growth_rate": "e.g., 30% MoM",
+      "milestones": ["key achievements"]
+    }},
+    "competitors": ["list of competitors"],
+    "ask": {{
+      "amount": "funding amount requested",
+      "use_of_funds": ["list of planned uses"]
+    }},
+    "risks": ["list of key risks"]
+  }},
+  "faqs": [
+    {{"question": "...", "answer": "..."}},
+    ...
+  ]
+}}
+
+Return ONLY valid JSON with exactly 20 FAQ items in the "faqs" array."""
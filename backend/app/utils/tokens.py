@@ -0,0 +1,46 @@
+import string
+from functools import lru_cache
+import tiktoken
+from app.config import LLM_MODEL, LLM_CONTEXT_TOKENS, LLM_MAX_TOKENS, LLM_INPUT_TOKEN_BUDGET
+
+# Tokens OpenAI adds around each chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Tokenizer for a model, falling back to cl100k_base for models tiktoken doesn't know."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = LLM_MODEL) -> str:
+    """text cut down to at most max_tokens tokens, on a token boundary."""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(max_tokens, 0)])
+
+
+def prompt_limit() -> int:
+    """Most prompt tokens a completion may use: the context window less max_tokens, capped by LLM_INPUT_TOKEN_BUDGET."""
+    limit = LLM_CONTEXT_TOKENS - LLM_MAX_TOKENS
+    return min(limit, LLM_INPUT_TOKEN_BUDGET) if LLM_INPUT_TOKEN_BUDGET > 0 else limit
+
+
+def input_budget(template: str, model: str = LLM_MODEL, **fields) -> int:
+    """Tokens left for a template's remaining placeholder once `fields` are filled in.
+
+    The other placeholders are rendered empty, so the result is what the
+    document text (or retrieved context) may take up without overflowing.
+    """
+    blanks = {name: "" for _, name, _, _ in string.Formatter().parse(template) if name}
+    scaffold = template.format(**{**blanks, **fields})
+    return max(0, prompt_limit() - count_tokens(scaffold, model) - MESSAGE_OVERHEAD_TOKENS)
@@ -0,0 +1,56 @@
+"""Standalone ingest worker.
+
+Run one or more of these next to the API (with INGEST_IN_API_PROCESS=false on
+the API) to take document processing out of the web server process:
+
+    python -m app.worker
+
+Workers claim jobs from the shared SQLite queue (JOB_QUEUE_PATH), so they
+must share the data and uploads directories with the API. Vectors must go
+through a Chroma server (CHROMA_HOST): an embedded Chroma store opened by two
+processes doesn't see the other's writes in its index, so Q&A in the API would
+miss documents the worker indexed.
+"""
+import signal
+import asyncio
+import logging
+from app.config import CHROMA_HOST
+from app.db import document_store, job_queue
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.llm_service import close_async_openai_client
+from app.utils.file_utils import ensure_dirs
+from app.utils.async_utils import (
+    run_blocking, start_loop_stall_monitor, stop_loop_stall_monitor, shutdown_blocking_executor,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker():
+    if not CHROMA_HOST:
+        logger.warning("CHROMA_HOST is not set: the API won't see vectors this worker writes until it restarts")
+    ensure_dirs()
+    start_loop_stall_monitor()
+    await run_blocking(job_queue.purge_finished)
+
+    pipeline = IngestPipeline(
+        get_doc=document_store.get_doc, update_doc=document_store.update_doc, emit_progress=job_queue.record_progress,
+    )
+    pipeline.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+    logger.info(f"Worker {pipeline.worker_id} shutting down")
+    await pipeline.stop()
+    await close_async_openai_client()
+    stop_loop_stall_monitor()
+    shutdown_blocking_executor()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_worker())
@@ -0,0 +1,80 @@
+"""Micro-benchmark: legacy word-count chunkers vs the tiktoken chunker.
+
+Builds a synthetic 1,000-page memo (or uses --pdf) and times chunk_pages and
+chunk_text against iter_token_chunks, reporting chunk counts and real token
+sizes of the chunks each one produces.
+
+    python benchmark_chunking.py [--pages 1000] [--pdf path/to/memo.pdf]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import EMBEDDING_MODEL  # noqa: E402
+from app.utils.chunking import chunk_pages, chunk_text, iter_token_chunks  # noqa: E402
+from app.utils.tokens import get_encoding  # noqa: E402
+
+WORDS = (
+    "revenue growth market customers platform enterprise retention churn pipeline margin "
+    "founders series valuation runway burn ARR logistics healthcare fintech adoption pricing"
+).split()
+
+
+def synthetic_pages(page_count: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    pages = []
+    for n in range(1, page_count + 1):
+        sentences = []
+        for _ in range(rng.randint(25, 45)):
+            words = rng.choices(WORDS, k=rng.randint(6, 28))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?", ":\n"]))
+        pages.append({"page_number": n, "text": " ".join(sentences)})
+    return pages
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def report(label: str, chunks: list[dict], elapsed: float):
+    enc = get_encoding(EMBEDDING_MODEL)
+    sizes = [len(enc.encode(c["text"], disallowed_special=())) for c in chunks] or [0]
+    print(
+        f"{label:<28} {elapsed:>8.3f}s {len(chunks):>7} chunks  "
+        f"tokens/chunk mean {statistics.mean(sizes):>6.0f}  max {max(sizes):>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--pdf", help="chunk this PDF's pages instead of synthetic text")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from app.services.pdf_processor import extract_text_with_pages
+
+        pages = [{"page_number": p.page_number, "text": p.text} for p in extract_text_with_pages(args.pdf)]
+    else:
+        pages = synthetic_pages(args.pages)
+    full_text = "\n".join(p["text"] for p in pages)
+    print(f"{len(pages)} pages, {len(full_text):,} characters\n")
+
+    # Warm the tokenizer so its one-time load isn't billed to the first run
+    get_encoding(EMBEDDING_MODEL).encode("warm up")
+
+    report("chunk_pages (words)", *timed(lambda: chunk_pages(pages)))
+    report("iter_token_chunks (pages)", *timed(lambda: list(iter_token_chunks(pages))))
+    report("chunk_text (words)", *timed(lambda: chunk_text(full_text)))
+    report("iter_token_chunks (text)", *timed(lambda: list(iter_token_chunks([{"page_number": 1, "text": full_text}]))))
+
+
+if __name__ == "__main__":
+    main()
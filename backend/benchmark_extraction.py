@@ -0,0 +1,164 @@
+"""Comparison harness: full-text extraction vs retrieval-targeted extraction.
+
+For each memo (the demo documents by default), indexes its chunks into a
+throwaway embedded Chroma store (never the one the app answers Q&A from), then
+runs both extraction modes without saving results.
+Reports prompt/completion tokens, wall-clock latency, and how often each
+targeted field agrees with the full-text answer (which is used as the reference).
+
+Makes real OpenAI calls (the LLM response cache is bypassed so latencies are
+real); embeddings are served from the embedding cache on repeat runs.
+
+    python benchmark_extraction.py [--top-k 6] [--keep-index] [memo.pdf ...]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Must be set before app.config is imported; load_dotenv() doesn't override them
+BENCH_CHROMA_PATH = tempfile.mkdtemp(prefix="chroma_benchmark_")
+os.environ["CHROMA_DB_PATH"] = BENCH_CHROMA_PATH
+os.environ["CHROMA_HOST"] = ""
+
+from app.config import DEMO_DOCS_DIR, EXTRACTION_TOP_K, LLM_MODEL  # noqa: E402
+from app.services.pdf_processor import get_pages  # noqa: E402
+from app.services.vector_service import add_document_to_store_async  # noqa: E402
+from app.services.llm_service import call_llm_async, close_async_openai_client  # noqa: E402
+from app.services.extraction_service import _build_prompt, run_targeted_extraction  # noqa: E402
+from app.utils.tokens import count_tokens  # noqa: E402
+
+SCALAR_FIELDS = [
+    "company_name", "pitch", "business_model",
+    "financials.revenue", "financials.burn_rate", "financials.runway", "financials.valuation",
+    "tam.total_addressable_market", "tam.serviceable_market",
+    "traction.growth_rate", "ask.amount",
+]
+LIST_FIELDS = ["founders", "competitors", "risks", "traction.metrics", "traction.milestones", "ask.use_of_funds"]
+
+
+def _get(data: dict, path: str):
+    for key in path.split("."):
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def _scalar_agrees(a, b) -> bool:
+    a, b = _norm(a), _norm(b)
+    return a == b or (bool(a) and bool(b) and (a in b or b in a))
+
+
+def _list_overlap(a, b) -> float:
+    """Jaccard overlap of normalized items (founders compared by name)."""
+    def items(values):
+        return {_norm(v.get("name") if isinstance(v, dict) else v) for v in values or []} - {""}
+
+    a, b = items(a), items(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+async def run_full(pdf_path: str) -> dict:
+    prompt = _build_prompt(pdf_path)
+    start = time.perf_counter()
+    response = await call_llm_async(prompt, json_mode=True, cache=False)
+    elapsed = time.perf_counter() - start
+    return {
+        "data": json.loads(response),
+        "prompt_tokens": count_tokens(prompt, LLM_MODEL),
+        "completion_tokens": count_tokens(response, LLM_MODEL),
+        "seconds": elapsed,
+    }
+
+
+async def run_targeted(doc_id: str, top_k: int) -> dict:
+    start = time.perf_counter()
+    groups = await run_targeted_extraction(doc_id, top_k, cache=False)
+    elapsed = time.perf_counter() - start
+    data = {}
+    for fields, _, _ in groups:
+        data.update(fields)
+    return {
+        "data": data,
+        "prompt_tokens": sum(count_tokens(prompt, LLM_MODEL) for _, prompt, _ in groups if prompt),
+        "completion_tokens": sum(count_tokens(response, LLM_MODEL) for _, _, response in groups if response),
+        "seconds": elapsed,
+    }
+
+
+async def benchmark(pdf_paths: list[str], top_k: int):
+    rows = []
+    agreement = {field: [] for field in SCALAR_FIELDS + LIST_FIELDS}
+    for pdf_path in pdf_paths:
+        name = os.path.basename(pdf_path)
+        doc_id = f"bench_{os.path.splitext(name)[0]}"
+        await add_document_to_store_async(doc_id, name, get_pages(pdf_path))
+        full = await run_full(pdf_path)
+        targeted = await run_targeted(doc_id, top_k)
+
+        for field in SCALAR_FIELDS:
+            agreement[field].append(float(_scalar_agrees(_get(full["data"], field), _get(targeted["data"], field))))
+        for field in LIST_FIELDS:
+            agreement[field].append(_list_overlap(_get(full["data"], field), _get(targeted["data"], field)))
+        rows.append((name, full, targeted))
+
+    print(f"{'memo':<40} {'full in/out':>14} {'full s':>7} {'targeted in/out':>16} {'targeted s':>11}")
+    for name, full, targeted in rows:
+        print(
+            f"{name[:40]:<40} {full['prompt_tokens']:>7}/{full['completion_tokens']:<6} {full['seconds']:>7.1f} "
+            f"{targeted['prompt_tokens']:>9}/{targeted['completion_tokens']:<6} {targeted['seconds']:>11.1f}"
+        )
+
+    full_in = sum(r[1]["prompt_tokens"] for r in rows)
+    targeted_in = sum(r[2]["prompt_tokens"] for r in rows)
+    print(f"\nprompt tokens: full {full_in:,}, targeted {targeted_in:,} ({targeted_in / max(full_in, 1):.0%} of full)")
+    print(
+        f"median latency: full {statistics.median(r[1]['seconds'] for r in rows):.1f}s, "
+        f"targeted {statistics.median(r[2]['seconds'] for r in rows):.1f}s"
+    )
+
+    print("\nagreement with full-text extraction (1.0 = identical):")
+    for field, scores in agreement.items():
+        print(f"  {field:<32} {statistics.mean(scores):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="memos to compare (default: every PDF in DEMO_DOCS_DIR)")
+    parser.add_argument("--top-k", type=int, default=EXTRACTION_TOP_K, help="chunks retrieved per field group")
+    parser.add_argument("--keep-index", action="store_true", help="keep the benchmark's Chroma store and print its path")
+    args = parser.parse_args()
+
+    pdf_paths = args.pdfs or sorted(
+        os.path.join(DEMO_DOCS_DIR, f) for f in os.listdir(DEMO_DOCS_DIR) if f.lower().endswith(".pdf")
+    )
+
+    async def run():
+        try:
+            await benchmark(pdf_paths, args.top_k)
+        finally:
+            await close_async_openai_client()
+
+    try:
+        asyncio.run(run())
+    finally:
+        if args.keep_index:
+            print(f"\nbenchmark index kept in {BENCH_CHROMA_PATH}")
+        else:
+            shutil.rmtree(BENCH_CHROMA_PATH, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
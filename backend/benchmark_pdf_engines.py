@@ -0,0 +1,119 @@
+"""Benchmark the PDF text-extraction engines in app.services.pdf_engines.
+
+Runs every engine over demo_documents/ and a synthetic large corpus built by
+repeating the demo pages, and reports pages/sec, peak RSS and how closely the
+extracted text matches pdfplumber's.
+
+    python benchmark_pdf_engines.py [--synthetic-pages 300] [--engines pdfplumber,pypdfium2]
+"""
+import os
+import sys
+import time
+import argparse
+import difflib
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.pdf_engines import ENGINES, get_engine  # noqa: E402
+
+DEMO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo_documents")
+REFERENCE_ENGINE = "pdfplumber"
+
+
+def build_synthetic_pdf(sources: list[str], target_pages: int, out_path: str):
+    """Concatenate demo pages until the output has target_pages pages."""
+    import pypdfium2 as pdfium
+
+    out = pdfium.PdfDocument.new()
+    while len(out) < target_pages:
+        for src_path in sources:
+            src = pdfium.PdfDocument(src_path)
+            remaining = target_pages - len(out)
+            out.import_pages(src, pages=list(range(min(len(src), remaining))))
+            src.close()
+            if len(out) >= target_pages:
+                break
+    out.save(out_path)
+    out.close()
+
+
+def _run_engine(engine: str, paths: list[str], conn):
+    """Child process body: extract every file and report text, timing and peak RSS."""
+    pdf_engine = get_engine(engine)
+    texts = {}
+    pages = 0
+    start = time.perf_counter()
+    for path in paths:
+        page_count = pdf_engine.count_pages(path)
+        texts[path] = [text for _, text in pdf_engine.extract_range(path, 0, page_count)]
+        pages += page_count
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    conn.send({"pages": pages, "elapsed": elapsed, "peak_rss_mb": rss_mb, "texts": texts})
+    conn.close()
+
+
+def run_engine(engine: str, paths: list[str]) -> dict:
+    """Run one engine in a fresh process so peak RSS is attributable to it alone."""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_engine, args=(engine, paths, child))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def similarity(reference: dict[str, list[str]], candidate: dict[str, list[str]]) -> float:
+    """Mean per-page word-sequence similarity against the reference engine."""
+    ratios = []
+    for path, ref_pages in reference.items():
+        cand_pages = candidate.get(path, [])
+        for i, ref_text in enumerate(ref_pages):
+            cand_text = cand_pages[i] if i < len(cand_pages) else ""
+            matcher = difflib.SequenceMatcher(None, ref_text.split(), cand_text.split(), autojunk=False)
+            ratios.append(matcher.ratio())
+    return sum(ratios) / len(ratios) if ratios else 0.0
+
+
+def benchmark(label: str, paths: list[str], engines: list[str]):
+    print(f"\n{label}: {len(paths)} file(s)")
+    print(f"{'engine':<12} {'pages':>6} {'seconds':>9} {'pages/sec':>10} {'peak RSS MB':>12} {'match':>7}")
+    results = {engine: run_engine(engine, paths) for engine in engines}
+    reference = results.get(REFERENCE_ENGINE) or run_engine(REFERENCE_ENGINE, paths)
+    for engine, r in results.items():
+        rate = r["pages"] / r["elapsed"] if r["elapsed"] else float("inf")
+        match = similarity(reference["texts"], r["texts"])
+        print(f"{engine:<12} {r['pages']:>6} {r['elapsed']:>9.2f} {rate:>10.1f} {r['peak_rss_mb']:>12.1f} {match:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma-separated engine names")
+    parser.add_argument("--synthetic-pages", type=int, default=300, help="pages in the synthetic large PDF (0 to skip)")
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    for engine in engines:
+        get_engine(engine)
+
+    demo_paths = sorted(os.path.join(DEMO_DIR, f) for f in os.listdir(DEMO_DIR) if f.endswith(".pdf"))
+    if not demo_paths:
+        sys.exit(f"No PDFs found in {DEMO_DIR}")
+    benchmark("Demo documents", demo_paths, engines)
+
+    if args.synthetic_pages > 0:
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic_path = os.path.join(tmp, "synthetic_large.pdf")
+            build_synthetic_pdf(demo_paths, args.synthetic_pages, synthetic_path)
+            benchmark(f"Synthetic corpus ({args.synthetic_pages} pages)", [synthetic_path], engines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import json
+import asyncio
+from app.services import extraction_service
+from app.utils import tokens
+
+GROUP_RESPONSES = {
+    "overview": {"company_name": "Acme", "pitch": "Rockets for everyone", "competitors": ["Globex"]},
+    "founders": {"founders": [{"name": "Wile E. Coyote", "role": "CEO"}]},
+    "financials": {"financials": {"revenue": "$1M ARR"}},
+    "ask": {"ask": {"amount": "$5M"}},
+}
+
+
+class WhitespaceEncoding:
+    """Stands in for tiktoken, which downloads its encodings on first use."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def test_targeted_extraction_saves_merged_groups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tokens, "get_encoding", lambda model: WhitespaceEncoding())
+
+    async def fake_query_embedding(query):
+        return [0.0]
+
+    def fake_query_documents(embedding, top_k, doc_ids):
+        return [{"doc_name": "acme.pdf", "page_number": 1, "text": "Acme builds rockets."}]
+
+    async def fake_call_llm_async(prompt, json_mode=False, label="", **kwargs):
+        group = label.split(":", 1)[1]
+        return json.dumps(GROUP_RESPONSES.get(group, {}))
+
+    monkeypatch.setattr(extraction_service, "get_query_embedding_async", fake_query_embedding)
+    monkeypatch.setattr(extraction_service, "query_documents", fake_query_documents)
+    monkeypatch.setattr(extraction_service, "call_llm_async", fake_call_llm_async)
+
+    result = asyncio.run(extraction_service.extract_document_async("doc1", "unused.pdf", mode="targeted"))
+
+    assert result.status == "completed"
+    assert result.company_name == "Acme"
+    assert result.founders[0].name == "Wile E. Coyote"
+    assert result.financials.revenue == "$1M ARR"
+    assert result.ask.amount == "$5M"
+    assert extraction_service.get_cached_extraction("doc1") == result